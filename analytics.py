@@ -0,0 +1,177 @@
+from typing import Dict
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import String, func, select, type_coerce
+
+from database import engine, DBSession
+from models import Trade, TradeStatus, TradingMode
+from request_auth import TTLCache
+
+ANALYTICS_CACHE_TTL = float(os.environ.get('ANALYTICS_CACHE_TTL', 300))
+ANALYTICS_CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', 1000))
+EQUITY_POINTS = 500
+
+
+def load_closed_trades(user_id: int, mode: TradingMode) -> Dict[str, np.ndarray]:
+    """A user's closed trades as column arrays in exit order, read without building ORM objects"""
+    query = select(
+        # Skip per-row datetime parsing; NumPy parses the ISO strings in bulk
+        type_coerce(Trade.exit_time, String), Trade.strategy_id, Trade.trading_pair,
+        Trade.profit_loss, Trade.profit_loss_pct
+    ).where(
+        Trade.user_id == user_id,
+        Trade.status == TradeStatus.CLOSED,
+        Trade.trading_mode == mode
+    ).order_by(Trade.exit_time, Trade.id)
+    with engine.connect() as conn:
+        rows = conn.execute(query).all()
+    exit_time, strategy_id, pair, pnl, pnl_pct = zip(*rows) if rows else ((),) * 5
+    return {
+        'exit_time': np.array(exit_time, dtype='datetime64[us]'),
+        'strategy_id': np.array(strategy_id, dtype=np.int64),
+        'pair': np.array(pair, dtype=object),
+        'pnl': np.array(pnl, dtype=float),
+        'pnl_pct': np.array(pnl_pct, dtype=float),
+    }
+
+
+def _max_drawdowns(inv: np.ndarray, pnl: np.ndarray, n_groups: int) -> np.ndarray:
+    """Largest peak-to-trough drop of each group's cumulative P&L, all groups in one pass"""
+    out = np.zeros(n_groups)
+    if not len(pnl):
+        return out
+    order = np.argsort(inv, kind='stable')
+    group, x = inv[order], pnl[order]
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    cum = np.cumsum(x)
+    equity = cum - np.repeat(cum[starts] - x[starts], np.diff(np.r_[starts, len(x)]))
+    # Lift each group clear above the ones before it so a single running max never crosses groups
+    offset = np.repeat(np.arange(len(starts)) * (2 * np.abs(x).sum() + 1), np.diff(np.r_[starts, len(x)]))
+    lifted = equity + offset
+    peak = np.maximum(np.maximum.accumulate(lifted), offset)
+    out[group[starts]] = np.maximum.reduceat(peak - lifted, starts)
+    return out
+
+
+def _group_stats(keys: np.ndarray, pnl: np.ndarray, returns: np.ndarray, years: float) -> list:
+    """Per-key P&L stats using bincount over the group index, no per-group loop"""
+    # Hash-based, much faster than np.unique on string keys
+    inv, labels = pd.factorize(keys, sort=True)
+    n = len(labels)
+    count = np.bincount(inv, minlength=n).astype(float)
+    total = np.bincount(inv, pnl, minlength=n)
+    wins = np.bincount(inv, pnl > 0, minlength=n)
+    gross_profit = np.bincount(inv, np.where(pnl > 0, pnl, 0.0), minlength=n)
+    gross_loss = np.bincount(inv, np.where(pnl < 0, -pnl, 0.0), minlength=n)
+    mean = np.bincount(inv, returns, minlength=n) / count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt((np.bincount(inv, returns ** 2, minlength=n) - count * mean ** 2) / (count - 1))
+        sharpe = mean / std * np.sqrt(count / years)
+    drawdown = _max_drawdowns(inv, pnl, n)
+    return [{
+        'key': labels[i],
+        'total_trades': int(count[i]),
+        'winning_trades': int(wins[i]),
+        'losing_trades': int(count[i]) - int(wins[i]),
+        'win_rate': wins[i] / count[i] * 100,
+        'total_pnl': total[i],
+        'avg_pnl': total[i] / count[i],
+        'profit_factor': gross_profit[i] / gross_loss[i] if gross_loss[i] > 0 else None,
+        'sharpe_ratio': sharpe[i] if count[i] > 1 and np.isfinite(sharpe[i]) else None,
+        'max_drawdown': drawdown[i]
+    } for i in range(n)]
+
+
+def compute_analytics(trades: Dict[str, np.ndarray], initial_balance: float = 10000.0) -> dict:
+    """Portfolio, per-strategy and per-pair stats plus an equity curve from load_closed_trades arrays.
+
+    Sharpe is per-trade return (profit_loss_pct) mean over std, annualized by the number
+    of trades per year over the period covered. Drawdowns are in quote currency.
+    """
+    pnl = np.nan_to_num(trades['pnl'])
+    returns = np.nan_to_num(trades['pnl_pct']) / 100
+    n = len(pnl)
+    if not n:
+        return {'summary': {'total_trades': 0, 'initial_balance': initial_balance, 'final_equity': initial_balance},
+                'by_strategy': [], 'by_pair': [], 'equity_curve': []}
+    times = trades['exit_time']
+    span_days = (times[-1] - times[0]) / np.timedelta64(1, 'D')
+    years = max(span_days, 1.0) / 365
+
+    equity = initial_balance + np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.maximum(equity, initial_balance))
+    drawdown = peak - equity
+    overall = _group_stats(np.zeros(n, dtype=np.int64), pnl, returns, years)[0]
+    overall.pop('key')
+    overall.update({
+        'max_drawdown': drawdown.max(),
+        'max_drawdown_pct': (drawdown / peak).max() * 100,
+        'initial_balance': initial_balance,
+        'final_equity': equity[-1],
+        'first_exit': np.datetime_as_string(times[0], unit='s'),
+        'last_exit': np.datetime_as_string(times[-1], unit='s')
+    })
+
+    by_strategy = _group_stats(trades['strategy_id'], pnl, returns, years)
+    for row in by_strategy:
+        row['strategy_id'] = row.pop('key')
+    by_pair = _group_stats(trades['pair'], pnl, returns, years)
+    for row in by_pair:
+        row['symbol'] = row.pop('key')
+
+    step = max(1, n // EQUITY_POINTS)
+    idx = np.r_[np.arange(0, n, step), n - 1] if (n - 1) % step else np.arange(0, n, step)
+    curve = [[t, e] for t, e in zip(np.datetime_as_string(times[idx], unit='s').tolist(), equity[idx].tolist())]
+
+    return {'summary': overall, 'by_strategy': by_strategy, 'by_pair': by_pair, 'equity_curve': curve}
+
+
+def _plain(value):
+    """NumPy scalars to JSON-safe Python values"""
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+class AnalyticsService:
+    """compute_analytics results cached per user, mode and starting balance.
+
+    The version is the count, latest exit_time and highest id of the user's closed trades
+    in that mode, read from the covering trades index, so it changes whenever a trade
+    closes (a newer exit_time) or closed trades are deleted with their strategy (a lower
+    count), in any process; a cached result is reused only while it is unchanged.
+    """
+
+    def __init__(self, ttl: float = ANALYTICS_CACHE_TTL, max_size: int = ANALYTICS_CACHE_SIZE):
+        self.cache = TTLCache(ttl, max_size)
+
+    @staticmethod
+    def version(user_id: int, mode: TradingMode) -> tuple:
+        with DBSession() as db:
+            return tuple(db.query(func.count(Trade.id), func.max(Trade.exit_time), func.max(Trade.id)).filter(
+                Trade.user_id == user_id,
+                Trade.status == TradeStatus.CLOSED,
+                Trade.trading_mode == mode
+            ).one())
+
+    def get(self, user_id: int, mode: TradingMode, initial_balance: float = 10000.0) -> dict:
+        key = (user_id, mode, initial_balance)
+        version = self.version(user_id, mode)
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        result = _plain(compute_analytics(load_closed_trades(user_id, mode), initial_balance))
+        self.cache.put(key, (version, result))
+        return result
+
+
+# Shared instance
+analytics_service = AnalyticsService()
@@ -1,15 +1,24 @@
-from exchange_connector import ExchangeConnector
-from trading_engine import TradingEngine
-from flask import Flask, request, jsonify, send_from_directory
+from exchange_connector import ExchangeConnector, client_pool
+from trading_engine import TradingEngine, encode_history_cursor
+from flask import Flask, g, request, jsonify
 from flask_cors import CORS
 from database import init_db, DBSession
-from models import User, Strategy, Backtest, Trade, StrategyStatus, TradingMode, APIKey
-from auth import hash_password, verify_password, create_access_token, get_user_from_token
-from datetime import datetime
+from models import User, Strategy, Backtest, Trade, StrategyStatus, TradingMode, APIKey, BacktestStatus
+from auth import hash_password, verify_password, create_access_token, create_stream_ticket, STREAM_TICKET_EXPIRE_SECONDS
+from request_auth import require_auth, request_auth
+from datetime import datetime, timedelta, timezone
 from api_key_manager import key_manager
+from market_feed import start_configured_feed
+from conditions import CompiledStrategy
+from analytics import analytics_service
+from json_response import json_response, rows_to_dicts, stream_query
+from response_cache import response_cache
+from static_assets import StaticAssets
+from sqlalchemy import func, select
 import os
 
-app = Flask(__name__, static_folder='frontend/build', static_url_path='')
+# Flask's own static route would bypass the asset manifest below
+app = Flask(__name__, static_folder=None)
 CORS(app)
 
 # Initialize database on startup
@@ -17,28 +26,18 @@ with app.app_context():
     init_db()
     print("✅ Database initialized")
 
+# Live order books for MARKET_FEED_SYMBOLS, if configured
+start_configured_feed()
+
 # ==================== SERVE REACT FRONTEND ====================
 
+# Indexed and precompressed once per worker; a new build needs a restart, as deploys do
+static_assets = StaticAssets()
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    if path != "" and os.path.exists(os.path.join('frontend/build', path)):
-        return send_from_directory('frontend/build', path)
-    else:
-        return send_from_directory('frontend/build', 'index.html')
-
-# ==================== AUTH MIDDLEWARE ====================
-
-def get_current_user(token):
-    if not token or not token.startswith('Bearer '):
-        return None
-    token = token.replace('Bearer ', '')
-    user_data = get_user_from_token(token)
-    if not user_data:
-        return None
-    with DBSession() as db:
-        user = db.query(User).filter(User.id == user_data['user_id']).first()
-        return user
+    return static_assets.response(path)
 
 # ==================== AUTH ENDPOINTS ====================
 
@@ -105,6 +104,7 @@ def login():
 
             user.last_login = datetime.utcnow()
             db.commit()
+            request_auth.invalidate(user.id)
 
             token = create_access_token({"sub": str(user.id)})
 
@@ -124,15 +124,13 @@ def login():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/auth/me', methods=['GET'])
+@require_auth
 def get_me():
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
 
-        return jsonify({
+        # The cached profile is the version: no query at all when the client is current
+        return response_cache.respond(user.id, 'me', user, lambda: json_response({
             'id': user.id,
             'username': user.username,
             'email': user.email,
@@ -140,8 +138,10 @@ def get_me():
             'paper_balance': user.paper_balance,
             'live_balance': user.live_balance,
             'max_open_trades': user.max_open_trades,
-            'risk_per_trade': user.risk_per_trade
-        }), 200
+            'risk_per_trade': user.risk_per_trade,
+            'paper_realized_pnl': user.paper_realized_pnl or 0.0,
+            'live_realized_pnl': user.live_realized_pnl or 0.0
+        }))
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -149,85 +149,80 @@ def get_me():
 # ==================== STRATEGY ENDPOINTS ====================
 
 @app.route('/api/strategies', methods=['GET'])
+@require_auth
 def get_strategies():
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
 
         with DBSession() as db:
-            strategies = db.query(Strategy).filter(Strategy.user_id == user.id).all()
-
-            return jsonify([{
-                'id': s.id,
-                'name': s.name,
-                'description': s.description,
-                'exchange': s.exchange,
-                'trading_pair': s.trading_pair,
-                'timeframe': s.timeframe,
-                'parameters': s.parameters,
-                'status': s.status.value,
-                'trading_mode': s.trading_mode.value,
-                'total_trades': s.total_trades,
-                'winning_trades': s.winning_trades,
-                'losing_trades': s.losing_trades,
-                'total_profit': s.total_profit,
-                'created_at': s.created_at.isoformat() if s.created_at else None
-            } for s in strategies]), 200
+            # Creates and deletes move the count or max id, edits updated_at, closed trades the counters
+            version = tuple(db.query(
+                func.count(Strategy.id), func.max(Strategy.id), func.max(Strategy.updated_at),
+                func.sum(Strategy.total_trades), func.sum(Strategy.total_profit)
+            ).filter(Strategy.user_id == user.id).one())
+
+        # Column tuples streamed straight to JSON, no ORM entities or per-row dicts held
+        return response_cache.respond(user.id, 'strategies', version, lambda: stream_query(select(
+            Strategy.id, Strategy.name, Strategy.description, Strategy.exchange,
+            Strategy.trading_pair, Strategy.timeframe, Strategy.parameters,
+            Strategy.status, Strategy.trading_mode, Strategy.total_trades,
+            Strategy.winning_trades, Strategy.losing_trades, Strategy.total_profit,
+            Strategy.created_at
+        ).where(Strategy.user_id == user.id)))
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/strategies/<int:strategy_id>', methods=['GET'])
+@require_auth
 def get_strategy(strategy_id):
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
 
         with DBSession() as db:
-            strategy = db.query(Strategy).filter(
+            version = db.query(Strategy.updated_at).filter(
                 Strategy.id == strategy_id,
                 Strategy.user_id == user.id
             ).first()
 
-            if not strategy:
-                return jsonify({'error': 'Strategy not found'}), 404
+        if not version:
+            return jsonify({'error': 'Strategy not found'}), 404
 
-            return jsonify({
-                'id': strategy.id,
-                'name': strategy.name,
-                'description': strategy.description,
-                'exchange': strategy.exchange,
-                'trading_pair': strategy.trading_pair,
-                'timeframe': strategy.timeframe,
-                'parameters': strategy.parameters,
-                'entry_conditions': strategy.entry_conditions,
-                'exit_conditions': strategy.exit_conditions,
-                'stop_loss_pct': strategy.stop_loss_pct,
-                'take_profit_pct': strategy.take_profit_pct,
-                'status': strategy.status.value,
-                'trading_mode': strategy.trading_mode.value
-            }), 200
+        def build():
+            with DBSession() as db:
+                row = db.execute(select(
+                    Strategy.id, Strategy.name, Strategy.description, Strategy.exchange,
+                    Strategy.trading_pair, Strategy.timeframe, Strategy.parameters,
+                    Strategy.entry_conditions, Strategy.exit_conditions,
+                    Strategy.stop_loss_pct, Strategy.take_profit_pct,
+                    Strategy.status, Strategy.trading_mode
+                ).where(Strategy.id == strategy_id)).one()
+                return json_response(row._asdict())
+
+        return response_cache.respond(user.id, f'strategy:{strategy_id}', version.updated_at, build)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/strategies', methods=['POST'])
+@require_auth
 def create_strategy():
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
 
         data = request.json
 
+        entry_conditions = data.get('entry_conditions')
+        exit_conditions = data.get('exit_conditions')
+        if exit_conditions and not entry_conditions:
+            # The runner only evaluates conditions when there are entry conditions
+            return jsonify({'error': 'exit_conditions require entry_conditions'}), 400
+        try:
+            if entry_conditions:
+                CompiledStrategy(entry_conditions, exit_conditions)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+
         with DBSession() as db:
             strategy = Strategy(
                 user_id=user.id,
@@ -237,6 +232,8 @@ def create_strategy():
                 trading_pair=data.get('trading_pair'),
                 timeframe=data.get('timeframe'),
                 parameters=data.get('parameters', {}),
+                entry_conditions=entry_conditions,
+                exit_conditions=exit_conditions,
                 stop_loss_pct=data.get('stop_loss_pct'),
                 take_profit_pct=data.get('take_profit_pct'),
                 status=StrategyStatus.DRAFT,
@@ -246,6 +243,7 @@ def create_strategy():
             db.add(strategy)
             db.commit()
             db.refresh(strategy)
+            response_cache.invalidate(user.id)
 
             return jsonify({'id': strategy.id, 'message': 'Strategy created'}), 201
 
@@ -253,13 +251,10 @@ def create_strategy():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/strategies/<int:strategy_id>', methods=['DELETE'])
+@require_auth
 def delete_strategy(strategy_id):
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
 
         with DBSession() as db:
             strategy = db.query(Strategy).filter(
@@ -272,21 +267,145 @@ def delete_strategy(strategy_id):
 
             db.delete(strategy)
             db.commit()
+            response_cache.invalidate(user.id)
 
             return jsonify({'message': 'Strategy deleted'}), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ==================== BACKTEST ENDPOINTS ====================
+
+def parse_utc(value: str) -> datetime:
+    """ISO timestamp as naive UTC, matching the DateTime columns; offsets are converted"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def backtest_to_dict(b, include_results=False):
+    result = {
+        'id': b.id,
+        'strategy_id': b.strategy_id,
+        'status': b.status.value,
+        'progress': b.progress,
+        'start_date': b.start_date.isoformat(),
+        'end_date': b.end_date.isoformat(),
+        'initial_balance': b.initial_balance,
+        'final_balance': b.final_balance,
+        'total_return_pct': b.total_return_pct,
+        'total_trades': b.total_trades,
+        'winning_trades': b.winning_trades,
+        'losing_trades': b.losing_trades,
+        'win_rate': b.win_rate,
+        'profit_factor': b.profit_factor,
+        'sharpe_ratio': b.sharpe_ratio,
+        'max_drawdown': b.max_drawdown,
+        'error_message': b.error_message,
+        'created_at': b.created_at.isoformat() if b.created_at else None,
+        'completed_at': b.completed_at.isoformat() if b.completed_at else None
+    }
+    if include_results:
+        result.update({
+            'avg_win': b.avg_win,
+            'avg_loss': b.avg_loss,
+            'largest_win': b.largest_win,
+            'largest_loss': b.largest_loss,
+            'results_data': b.results_data
+        })
+    return result
+
+@app.route('/api/backtests', methods=['POST'])
+@require_auth
+def create_backtest():
+    try:
+        user = g.user
+
+        data = request.get_json()
+        strategy_id = data.get('strategy_id')
+        try:
+            end_date = parse_utc(data['end_date']) if data.get('end_date') else datetime.utcnow()
+            start_date = parse_utc(data['start_date']) if data.get('start_date') else end_date - timedelta(days=30)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid date: {str(e)}'}), 400
+
+        if start_date >= end_date:
+            return jsonify({'error': 'start_date must be before end_date'}), 400
+
+        with DBSession() as db:
+            strategy = db.query(Strategy).filter(
+                Strategy.id == strategy_id,
+                Strategy.user_id == user.id
+            ).first()
+
+            if not strategy:
+                return jsonify({'error': 'Strategy not found'}), 404
+
+            # Queued only; backtest_worker.py picks up PENDING rows
+            backtest = Backtest(
+                user_id=user.id,
+                strategy_id=strategy.id,
+                start_date=start_date,
+                end_date=end_date,
+                initial_balance=float(data.get('initial_balance', 10000)),
+                status=BacktestStatus.PENDING,
+                progress=0.0
+            )
+            db.add(backtest)
+            db.commit()
+            db.refresh(backtest)
+
+            return jsonify(backtest_to_dict(backtest)), 202
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/backtests', methods=['GET'])
+@require_auth
+def list_backtests():
+    try:
+        user = g.user
+
+        strategy_id = request.args.get('strategy_id', type=int)
+
+        with DBSession() as db:
+            query = db.query(Backtest).filter(Backtest.user_id == user.id)
+            if strategy_id:
+                query = query.filter(Backtest.strategy_id == strategy_id)
+            backtests = query.order_by(Backtest.created_at.desc()).limit(50).all()
+
+            return jsonify({'backtests': [backtest_to_dict(b) for b in backtests]}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/backtests/<int:backtest_id>', methods=['GET'])
+@require_auth
+def get_backtest(backtest_id):
+    try:
+        user = g.user
+
+        with DBSession() as db:
+            backtest = db.query(Backtest).filter(
+                Backtest.id == backtest_id,
+                Backtest.user_id == user.id
+            ).first()
+
+            if not backtest:
+                return jsonify({'error': 'Backtest not found'}), 404
+
+            return jsonify(backtest_to_dict(backtest, include_results=True)), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ==================== API KEY MANAGEMENT ====================
 
 @app.route('/api/api-keys/store', methods=['POST'])
+@require_auth
 def store_api_key():
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
         
         data = request.get_json()
         exchange = data.get('exchange')
@@ -319,38 +438,39 @@ def store_api_key():
                 db.add(new_key)
             
             db.commit()
+            client_pool.invalidate(user.id, exchange.lower())
+            response_cache.invalidate(user.id)
             return jsonify({'success': True}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/api-keys/list', methods=['GET'])
+@require_auth
 def list_api_keys():
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
         
         with DBSession() as db:
-            keys = db.query(APIKey).filter(APIKey.user_id == user.id).all()
-            return jsonify({
-                'keys': [{
-                    'id': k.id,
-                    'exchange': k.exchange,
-                    'is_active': k.is_active,
-                    'created_at': k.created_at.isoformat()
-                } for k in keys]
-            }), 200
+            version = tuple(db.query(
+                func.count(APIKey.id), func.max(APIKey.id), func.max(APIKey.updated_at)
+            ).filter(APIKey.user_id == user.id).one())
+
+        def build():
+            with DBSession() as db:
+                result = db.execute(select(
+                    APIKey.id, APIKey.exchange, APIKey.is_active, APIKey.created_at
+                ).where(APIKey.user_id == user.id))
+                return json_response({'keys': rows_to_dicts(list(result.keys()), result)})
+
+        return response_cache.respond(user.id, 'api-keys', version, build)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/api-keys/<int:key_id>', methods=['DELETE'])
+@require_auth
 def delete_api_key(key_id):
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
         
         with DBSession() as db:
             key = db.query(APIKey).filter(
@@ -361,19 +481,20 @@ def delete_api_key(key_id):
             if not key:
                 return jsonify({'error': 'API key not found'}), 404
             
+            exchange = key.exchange
             db.delete(key)
             db.commit()
+            client_pool.invalidate(user.id, exchange.lower())
+            response_cache.invalidate(user.id)
             return jsonify({'success': True}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/api-keys/test-connection', methods=['POST'])
+@require_auth
 def test_connection():
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
         
         data = request.get_json()
         exchange = data.get('exchange', 'gemini')
@@ -396,32 +517,30 @@ def test_connection():
 # ==================== TRADING ENDPOINTS ====================
 
 @app.route('/api/trading/balance', methods=['GET'])
+@require_auth
 def trading_get_balance():
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
         
         exchange = request.args.get('exchange', 'gemini')
-        engine = TradingEngine(user.id, exchange)
+        mode = TradingMode(request.args.get('trading_mode', 'live'))
+        engine = TradingEngine(user.id, exchange, mode)
         balance = engine.get_balance()
         
         return jsonify({'balance': balance}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/trading/ticker/<symbol>', methods=['GET'])
+@require_auth
 def trading_get_ticker(symbol):
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
         
         exchange = request.args.get('exchange', 'gemini')
         connector = ExchangeConnector(user.id, exchange)
-        connector.connect()
         ticker = connector.get_ticker(symbol)
         
         return jsonify({'ticker': ticker}), 200
@@ -429,12 +548,10 @@ def trading_get_ticker(symbol):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/trading/buy', methods=['POST'])
+@require_auth
 def trading_execute_buy():
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
         
         data = request.get_json()
         exchange = data.get('exchange', 'gemini')
@@ -443,101 +560,155 @@ def trading_execute_buy():
         strategy_id = data.get('strategy_id')
         stop_loss_pct = data.get('stop_loss_pct')
         take_profit_pct = data.get('take_profit_pct')
+        mode = TradingMode(data.get('trading_mode', 'live'))
         
         if not symbol or not amount:
             return jsonify({'error': 'Symbol and amount required'}), 400
         
-        engine = TradingEngine(user.id, exchange)
+        engine = TradingEngine(user.id, exchange, mode)
         result = engine.execute_buy(
             symbol=symbol,
             amount=float(amount),
             strategy_id=strategy_id,
             stop_loss_pct=stop_loss_pct,
-            take_profit_pct=take_profit_pct
+            take_profit_pct=take_profit_pct,
+            order_type=data.get('order_type', 'market'),
+            price=data.get('price')
         )
+        if mode == TradingMode.PAPER:
+            request_auth.invalidate(user.id)
         
         return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/trading/sell', methods=['POST'])
+@require_auth
 def trading_execute_sell():
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
         
         data = request.get_json()
         exchange = data.get('exchange', 'gemini')
         symbol = data.get('symbol')
         amount = data.get('amount')
         trade_id = data.get('trade_id')
+        mode = TradingMode(data.get('trading_mode', 'live'))
         
         if not symbol or not amount:
             return jsonify({'error': 'Symbol and amount required'}), 400
         
-        engine = TradingEngine(user.id, exchange)
+        engine = TradingEngine(user.id, exchange, mode)
         result = engine.execute_sell(
             symbol=symbol,
             amount=float(amount),
-            trade_id=trade_id
+            trade_id=trade_id,
+            order_type=data.get('order_type', 'market'),
+            price=data.get('price')
         )
+        # Sells change realized P&L in either mode, and paper_balance in paper mode
+        request_auth.invalidate(user.id)
         
         return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/trading/positions', methods=['GET'])
+@require_auth
 def get_positions():
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
         
         exchange = request.args.get('exchange', 'gemini')
-        engine = TradingEngine(user.id, exchange)
+        mode = TradingMode(request.args.get('trading_mode', 'live'))
+        engine = TradingEngine(user.id, exchange, mode)
         positions = engine.get_open_positions()
         
         return jsonify({'positions': positions}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/trading/positions/<int:trade_id>/close', methods=['POST'])
+@require_auth
 def close_position(trade_id):
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
         
         exchange = request.args.get('exchange', 'gemini')
-        engine = TradingEngine(user.id, exchange)
+        mode = TradingMode(request.args.get('trading_mode', 'live'))
+        engine = TradingEngine(user.id, exchange, mode)
         result = engine.close_position(trade_id)
+        # Sells change realized P&L in either mode, and paper_balance in paper mode
+        request_auth.invalidate(user.id)
         
         return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/trading/history', methods=['GET'])
+@require_auth
 def get_trade_history():
     try:
-        auth_header = request.headers.get('Authorization')
-        user = get_current_user(auth_header)
-        if not user:
-            return jsonify({'error': 'Unauthorized'}), 401
+        user = g.user
         
-        limit = request.args.get('limit', 50, type=int)
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        cursor = request.args.get('cursor')
         exchange = request.args.get('exchange', 'gemini')
+        mode = TradingMode(request.args.get('trading_mode', 'live'))
         
-        engine = TradingEngine(user.id, exchange)
-        history = engine.get_trade_history(limit=limit)
+        engine = TradingEngine(user.id, exchange, mode)
+        keys, rows = engine.trade_history_rows(limit=limit, cursor=cursor)
+        history = rows_to_dicts(keys, rows)
+        next_cursor = encode_history_cursor(history[-1]) if len(history) == limit else None
         
-        return jsonify({'trades': history}), 200
+        return json_response({'trades': history, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ==================== ANALYTICS ENDPOINTS ====================
+
+@app.route('/api/analytics', methods=['GET'])
+@require_auth
+def get_analytics():
+    try:
+        user = g.user
+
+        mode = TradingMode(request.args.get('trading_mode', 'live'))
+        initial_balance = request.args.get('initial_balance', 10000.0, type=float)
+        return jsonify(analytics_service.get(user.id, mode, initial_balance)), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ==================== STREAMING ====================
+
+@app.route('/api/stream/ticket', methods=['POST'])
+@require_auth
+def get_stream_ticket():
+    try:
+        user = g.user
+        return jsonify({'ticket': create_stream_ticket(user.id), 'expires_in': STREAM_TICKET_EXPIRE_SECONDS}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stream', methods=['GET'])
+def stream_unavailable():
+    # asgi_app serves the real /api/stream; without it, fail clearly instead of falling
+    # through to index.html, so EventSource gives up and the client polls
+    return jsonify({'error': 'Streaming requires the ASGI server (uvicorn asgi_app:app)'}), 503
+
 # ==================== HEALTH CHECK ====================
 
 @app.route('/api/health', methods=['GET'])
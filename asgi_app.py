@@ -0,0 +1,280 @@
+"""Async serving mode: uvicorn asgi_app:app
+
+The /api/trading/* and test-connection routes run on the event loop with ccxt.async_support,
+so slow exchange calls no longer hold a worker each. Every other path is passed through to
+the Flask app unchanged. Responses match the Flask routes. /api/stream pushes ticker
+and open-position updates as Server-Sent Events.
+"""
+from contextlib import asynccontextmanager
+from functools import wraps
+import asyncio
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app
+from auth import decode_stream_ticket
+from async_trading import AsyncTradingEngine, AsyncExchangeConnector, async_client_pool
+from models import TradingMode
+from price_stream import price_hub, sse, STREAM_QUEUE_SIZE
+from request_auth import request_auth
+from trading_engine import TradingEngine, encode_history_cursor
+
+POSITIONS_REFRESH_INTERVAL = float(os.environ.get('STREAM_POSITIONS_REFRESH', 10.0))
+KEEPALIVE_INTERVAL = 15.0
+
+
+def require_auth(endpoint):
+    """Async twin of request_auth.require_auth; the profile is put on request.state.user"""
+    @wraps(endpoint)
+    async def wrapper(request):
+        try:
+            user = await run_in_threadpool(request_auth.current_user, request.headers.get('Authorization'))
+        except Exception as e:
+            return JSONResponse({'error': str(e)}, status_code=500)
+        if not user:
+            return JSONResponse({'error': 'Unauthorized'}, status_code=401)
+        request.state.user = user
+        return await endpoint(request)
+    return wrapper
+
+# ==================== TRADING ENDPOINTS ====================
+
+@require_auth
+async def trading_get_balance(request):
+    try:
+        user = request.state.user
+        exchange = request.query_params.get('exchange', 'gemini')
+        mode = TradingMode(request.query_params.get('trading_mode', 'live'))
+        balance = await AsyncTradingEngine(user.id, exchange, mode).get_balance()
+        return JSONResponse({'balance': balance})
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@require_auth
+async def trading_get_ticker(request):
+    try:
+        user = request.state.user
+        exchange = request.query_params.get('exchange', 'gemini')
+        ticker = await AsyncExchangeConnector(user.id, exchange).get_ticker(request.path_params['symbol'])
+        return JSONResponse({'ticker': ticker})
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@require_auth
+async def trading_execute_buy(request):
+    try:
+        user = request.state.user
+        data = await request.json()
+        symbol = data.get('symbol')
+        amount = data.get('amount')
+
+        if not symbol or not amount:
+            return JSONResponse({'error': 'Symbol and amount required'}, status_code=400)
+
+        mode = TradingMode(data.get('trading_mode', 'live'))
+        engine = AsyncTradingEngine(user.id, data.get('exchange', 'gemini'), mode)
+        result = await engine.execute_buy(
+            symbol=symbol,
+            amount=float(amount),
+            strategy_id=data.get('strategy_id'),
+            stop_loss_pct=data.get('stop_loss_pct'),
+            take_profit_pct=data.get('take_profit_pct'),
+            order_type=data.get('order_type', 'market'),
+            price=data.get('price')
+        )
+        if mode == TradingMode.PAPER:
+            request_auth.invalidate(user.id)
+        return JSONResponse(result)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@require_auth
+async def trading_execute_sell(request):
+    try:
+        user = request.state.user
+        data = await request.json()
+        symbol = data.get('symbol')
+        amount = data.get('amount')
+
+        if not symbol or not amount:
+            return JSONResponse({'error': 'Symbol and amount required'}, status_code=400)
+
+        mode = TradingMode(data.get('trading_mode', 'live'))
+        engine = AsyncTradingEngine(user.id, data.get('exchange', 'gemini'), mode)
+        result = await engine.execute_sell(symbol=symbol, amount=float(amount), trade_id=data.get('trade_id'),
+                                           order_type=data.get('order_type', 'market'), price=data.get('price'))
+        # Sells change realized P&L in either mode, and paper_balance in paper mode
+        request_auth.invalidate(user.id)
+        return JSONResponse(result)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@require_auth
+async def get_positions(request):
+    try:
+        user = request.state.user
+        exchange = request.query_params.get('exchange', 'gemini')
+        mode = TradingMode(request.query_params.get('trading_mode', 'live'))
+        positions = await AsyncTradingEngine(user.id, exchange, mode).get_open_positions()
+        return JSONResponse({'positions': positions})
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@require_auth
+async def close_position(request):
+    try:
+        user = request.state.user
+        exchange = request.query_params.get('exchange', 'gemini')
+        mode = TradingMode(request.query_params.get('trading_mode', 'live'))
+        result = await AsyncTradingEngine(user.id, exchange, mode).close_position(request.path_params['trade_id'])
+        # Sells change realized P&L in either mode, and paper_balance in paper mode
+        request_auth.invalidate(user.id)
+        return JSONResponse(result)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@require_auth
+async def get_trade_history(request):
+    try:
+        user = request.state.user
+        try:
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            limit = 50
+        limit = max(1, min(limit, 500))
+        exchange = request.query_params.get('exchange', 'gemini')
+        mode = TradingMode(request.query_params.get('trading_mode', 'live'))
+
+        engine = AsyncTradingEngine(user.id, exchange, mode)
+        history = await engine.get_trade_history(limit=limit, cursor=request.query_params.get('cursor'))
+        next_cursor = encode_history_cursor(history[-1]) if len(history) == limit else None
+        return JSONResponse({'trades': history, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@require_auth
+async def test_connection(request):
+    try:
+        user = request.state.user
+        data = await request.json()
+        balance = await AsyncTradingEngine(user.id, data.get('exchange', 'gemini')).get_balance()
+        return JSONResponse({
+            'success': True,
+            'message': 'Connection successful',
+            'balance': balance
+        })
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=400)
+
+# ==================== STREAMING ====================
+
+async def stream(request):
+    """SSE feed of ticker ticks and the user's open positions with unrealized P&L.
+
+    EventSource cannot send headers, so it authenticates with ?ticket= from
+    POST /api/stream/ticket: short-lived and stream-only, unlike the JWT, since URLs end
+    up in access logs. ?symbols=A,B adds symbols to watch besides those of open positions.
+    """
+    ticket = request.query_params.get('ticket')
+    try:
+        if ticket:
+            user_id = decode_stream_ticket(ticket)
+            user = await run_in_threadpool(request_auth.profile, user_id) if user_id is not None else None
+        else:
+            user = await run_in_threadpool(request_auth.current_user, request.headers.get('Authorization'))
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+    if not user:
+        return JSONResponse({'error': 'Unauthorized'}, status_code=401)
+
+    try:
+        mode = TradingMode(request.query_params.get('trading_mode', 'live'))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    exchange = request.query_params.get('exchange', 'gemini').lower()
+    extra = {s for s in request.query_params.get('symbols', '').split(',') if s}
+    engine = TradingEngine(user.id, exchange, mode)
+
+    async def events():
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        watched, trades, tickers, refreshed = set(), [], {}, 0.0
+        try:
+            while True:
+                if time.monotonic() - refreshed >= POSITIONS_REFRESH_INTERVAL:
+                    # Pick up trades opened or closed since the last look
+                    trades = await run_in_threadpool(engine._open_trades)
+                    wanted = extra | {trade.trading_pair for trade in trades}
+                    for symbol in wanted - watched:
+                        price_hub.subscribe(exchange, symbol, queue)
+                    for symbol in watched - wanted:
+                        price_hub.unsubscribe(exchange, symbol, queue)
+                        tickers.pop(symbol, None)
+                    watched, refreshed = wanted, time.monotonic()
+                    yield sse('positions', {'positions': TradingEngine._positions(trades, tickers)})
+
+                timeout = min(KEEPALIVE_INTERVAL, POSITIONS_REFRESH_INTERVAL - (time.monotonic() - refreshed))
+                try:
+                    _, symbol, ticker = await asyncio.wait_for(queue.get(), timeout=max(timeout, 0))
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if symbol not in watched:
+                    continue
+                tickers[symbol] = ticker
+                yield sse('ticker', {'symbol': symbol, 'ticker': ticker})
+                if any(trade.trading_pair == symbol for trade in trades):
+                    yield sse('positions', {'positions': TradingEngine._positions(trades, tickers)})
+        finally:
+            for symbol in watched:
+                price_hub.unsubscribe(exchange, symbol, queue)
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ==================== APP ====================
+
+# Same policy as flask_cors on the Flask side; preflight OPTIONS requests fall through to Flask
+cors = [Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])]
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    price_hub.close()
+    await async_client_pool.close()
+
+app = Starlette(
+    routes=[
+        Route('/api/trading/balance', trading_get_balance, methods=['GET'], middleware=cors),
+        Route('/api/trading/ticker/{symbol}', trading_get_ticker, methods=['GET'], middleware=cors),
+        Route('/api/trading/buy', trading_execute_buy, methods=['POST'], middleware=cors),
+        Route('/api/trading/sell', trading_execute_sell, methods=['POST'], middleware=cors),
+        Route('/api/trading/positions', get_positions, methods=['GET'], middleware=cors),
+        Route('/api/trading/positions/{trade_id:int}/close', close_position, methods=['POST'], middleware=cors),
+        Route('/api/trading/history', get_trade_history, methods=['GET'], middleware=cors),
+        Route('/api/api-keys/test-connection', test_connection, methods=['POST'], middleware=cors),
+        Route('/api/stream', stream, methods=['GET'], middleware=cors),
+        # Everything else is served by the Flask app
+        Mount('/', WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,283 @@
+import asyncio
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+import ccxt.async_support as ccxt_async
+from starlette.concurrency import run_in_threadpool
+
+from exchange_connector import client_pool, CLIENT_TTL, CLIENT_CACHE_SIZE
+from models import TradingMode
+from ticker_cache import ticker_cache
+from trading_engine import TradingEngine
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncExchangeClientPool:
+    """ccxt.async_support clients for one event loop, keyed by (user_id, exchange).
+
+    Mirrors ExchangeClientPool: same TTL and size, API keys come from the same place and
+    are version-checked on every checkout, and market metadata is shared with the sync
+    pool. Clients dropped from the pool are closed from the event loop on the next get().
+    """
+
+    def __init__(self, ttl=CLIENT_TTL, max_size=CLIENT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clients = OrderedDict()
+        self._pending = {}
+        self._retired = []
+        # invalidate() is also called from WSGI threads
+        self._lock = threading.Lock()
+        client_pool.listeners.append(self.invalidate)
+
+    async def get(self, user_id, exchange_name):
+        await self._close_retired()
+        key = (user_id, exchange_name)
+        version = await run_in_threadpool(client_pool.key_version, user_id, exchange_name)
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry and time.monotonic() - entry[1] < self.ttl and entry[2] == version:
+                self._clients.move_to_end(key)
+                return entry[0]
+            if entry:
+                self._retired.append(self._clients.pop(key)[0])
+
+        # Concurrent misses on one key share a single client
+        task = self._pending.get(key)
+        if task:
+            return await asyncio.shield(task)
+        task = self._pending[key] = asyncio.ensure_future(self._create(user_id, exchange_name))
+        try:
+            client = await asyncio.shield(task)
+        finally:
+            del self._pending[key]
+        with self._lock:
+            self._clients[key] = (client, time.monotonic(), version)
+            while len(self._clients) > self.max_size:
+                self._retired.append(self._clients.popitem(last=False)[1][0])
+        return client
+
+    def invalidate(self, user_id, exchange_name=None):
+        with self._lock:
+            for key in [k for k in self._clients if k[0] == user_id and exchange_name in (None, k[1])]:
+                self._retired.append(self._clients.pop(key)[0])
+
+    async def _create(self, user_id, exchange_name):
+        # APIKey query and decryption are blocking
+        config = await run_in_threadpool(client_pool.config, user_id, exchange_name)
+        client = getattr(ccxt_async, exchange_name)(config)
+        cached = client_pool.cached_markets(exchange_name)
+        if cached:
+            client.set_markets(*cached)
+            return client
+        try:
+            await client.load_markets()
+            client_pool.store_markets(exchange_name, client)
+        except Exception:
+            # Leave it to ccxt to load lazily on first call
+            pass
+        return client
+
+    async def _close_retired(self):
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for client in retired:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close exchange client: {str(e)}")
+
+    async def close(self):
+        with self._lock:
+            self._retired.extend(entry[0] for entry in self._clients.values())
+            self._clients.clear()
+        await self._close_retired()
+
+
+# Singleton instance, used from the ASGI app's event loop
+async_client_pool = AsyncExchangeClientPool()
+
+
+class AsyncExchangeConnector:
+    """ExchangeConnector whose exchange calls are awaitable"""
+
+    def __init__(self, user_id, exchange_name='gemini'):
+        self.user_id = user_id
+        self.exchange_name = exchange_name.lower()
+        self.exchange = None
+
+    async def connect(self):
+        self.exchange = await async_client_pool.get(self.user_id, self.exchange_name)
+        return self.exchange
+
+    async def get_balance(self):
+        if not self.exchange:
+            await self.connect()
+        return await self.exchange.fetch_balance()
+
+    async def create_market_buy(self, symbol, amount):
+        if not self.exchange:
+            await self.connect()
+        return await self.exchange.create_market_buy_order(symbol, amount)
+
+    async def create_market_sell(self, symbol, amount):
+        if not self.exchange:
+            await self.connect()
+        return await self.exchange.create_market_sell_order(symbol, amount)
+
+    async def get_ticker(self, symbol, max_age=None):
+        '''Current ticker, served from the shared ticker cache when fresh'''
+        ticker = ticker_cache.local(self.exchange_name, symbol, max_age)
+        if ticker is not None:
+            return ticker
+        if not self.exchange:
+            await self.connect()
+        # The shared tier and its lease are blocking SQLite calls, so they run in the
+        # threadpool; the upstream fetch itself is still awaited on this loop
+        fetch = self._on_loop(lambda: self.exchange.fetch_ticker(symbol))
+        return await run_in_threadpool(ticker_cache.get, self.exchange_name, symbol, fetch, max_age)
+
+    async def get_tickers(self, symbols, max_age=None):
+        '''Tickers for several symbols; cache misses are fetched together'''
+        result, missing = {}, []
+        for symbol in dict.fromkeys(symbols):
+            ticker = ticker_cache.local(self.exchange_name, symbol, max_age)
+            if ticker is not None:
+                result[symbol] = ticker
+            else:
+                missing.append(symbol)
+        if missing:
+            if not self.exchange:
+                await self.connect()
+            fetch_many = self._on_loop(self._fetch_tickers)
+            result.update(await run_in_threadpool(ticker_cache.get_many, self.exchange_name, missing,
+                                                  fetch_many, max_age))
+        return result
+
+    @staticmethod
+    def _on_loop(coroutine_function):
+        '''Blocking wrapper, for use from a threadpool thread, that runs the coroutine on the calling loop'''
+        loop = asyncio.get_running_loop()
+
+        def call(*args):
+            return asyncio.run_coroutine_threadsafe(coroutine_function(*args), loop).result()
+        return call
+
+    async def _fetch_tickers(self, symbols):
+        if not self.exchange:
+            await self.connect()
+        if self.exchange.has.get('fetchTickers'):
+            try:
+                return await self.exchange.fetch_tickers(symbols)
+            except Exception:
+                # Some exchanges only support fetching all tickers; fall back to per-symbol
+                pass
+        tickers = await asyncio.gather(*(self.exchange.fetch_ticker(s) for s in symbols), return_exceptions=True)
+        return {s: t for s, t in zip(symbols, tickers) if not isinstance(t, BaseException)}
+
+
+class ThreadedConnector:
+    """Awaitable facade over a blocking connector such as PaperBroker"""
+
+    def __init__(self, connector):
+        self.connector = connector
+
+    def __getattr__(self, name):
+        method = getattr(self.connector, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(method, *args, **kwargs)
+        return call
+
+
+class AsyncTradingEngine(TradingEngine):
+    """TradingEngine for the ASGI app: exchange calls are awaited, database work runs in the threadpool"""
+
+    def __init__(self, user_id: int, exchange: str = 'gemini', mode: TradingMode = TradingMode.LIVE):
+        super().__init__(user_id, exchange, mode)
+        if mode == TradingMode.PAPER:
+            self.connector = ThreadedConnector(self.connector)
+        else:
+            self.connector = AsyncExchangeConnector(user_id, exchange)
+
+    async def _place_order(self, side: str, symbol: str, amount: float, order_type: str = 'market', price: float = None):
+        if order_type == 'limit':
+            if self.mode != TradingMode.PAPER:
+                raise Exception("Limit orders are only supported in paper trading")
+            return await self.connector.create_limit_order(symbol, side, amount, price)
+        if side == 'buy':
+            return await self.connector.create_market_buy(symbol, amount)
+        return await self.connector.create_market_sell(symbol, amount)
+
+    async def execute_buy(self, symbol: str, amount: float, strategy_id: int = None,
+                          stop_loss_pct: float = None, take_profit_pct: float = None,
+                          order_type: str = 'market', price: float = None) -> dict:
+        await run_in_threadpool(self._check_strategy, strategy_id)
+        try:
+            ticker = await self.connector.get_ticker(symbol)
+            order = await self._place_order('buy', symbol, amount, order_type, price)
+            return await run_in_threadpool(self._record_buy, symbol, amount, order, ticker['last'],
+                                           strategy_id, stop_loss_pct, take_profit_pct)
+        except Exception as e:
+            logger.error(f"Buy order failed: {str(e)}")
+            raise Exception(f"Failed to execute buy order: {str(e)}")
+
+    async def execute_sell(self, symbol: str, amount: float, trade_id: int = None,
+                           exit_reason: str = 'manual_close', order_type: str = 'market', price: float = None) -> dict:
+        if trade_id:
+            await run_in_threadpool(self._check_close, trade_id, symbol, amount)
+        try:
+            if self.mode == TradingMode.PAPER and not trade_id:
+                raise Exception("Paper sells must close an open paper trade")
+            ticker = await self.connector.get_ticker(symbol)
+            exit_price = ticker['last']
+            order = await self._place_order('sell', symbol, amount, order_type, price)
+            if self.mode == TradingMode.PAPER:
+                exit_price = order['average']
+            if trade_id:
+                await run_in_threadpool(self._record_sell, trade_id, exit_price, amount, exit_reason, order)
+            return {
+                'success': True,
+                'order': order,
+                'exit_price': exit_price,
+                'amount': amount
+            }
+        except Exception as e:
+            logger.error(f"Sell order failed: {str(e)}")
+            raise Exception(f"Failed to execute sell order: {str(e)}")
+
+    async def get_balance(self) -> dict:
+        try:
+            return await self.connector.get_balance()
+        except Exception as e:
+            logger.error(f"Failed to get balance: {str(e)}")
+            raise Exception(f"Failed to get balance: {str(e)}")
+
+    async def get_open_positions(self) -> list:
+        try:
+            trades = await run_in_threadpool(self._open_trades)
+            if not trades:
+                return []
+            try:
+                tickers = await self.connector.get_tickers(trade.trading_pair for trade in trades)
+            except Exception as e:
+                logger.warning(f"Failed to get tickers for positions: {str(e)}")
+                tickers = {}
+            return self._positions(trades, tickers)
+        except Exception as e:
+            logger.error(f"Failed to get positions: {str(e)}")
+            raise Exception(f"Failed to get positions: {str(e)}")
+
+    async def get_trade_history(self, limit: int = 50, cursor: str = None) -> list:
+        return await run_in_threadpool(super().get_trade_history, limit, cursor)
+
+    async def close_position(self, trade_id: int, reason: str = 'manual_close') -> dict:
+        try:
+            symbol, amount = await run_in_threadpool(self._open_trade, trade_id)
+            return await self.execute_sell(symbol=symbol, amount=amount, trade_id=trade_id, exit_reason=reason)
+        except Exception as e:
+            logger.error(f"Failed to close position: {str(e)}")
+            raise Exception(f"Failed to close position: {str(e)}")
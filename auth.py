@@ -8,6 +8,7 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
+STREAM_TICKET_EXPIRE_SECONDS = 30
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -30,6 +31,20 @@ def decode_access_token(token: str):
     except JWTError:
         return None
 
+def create_stream_ticket(user_id: int) -> str:
+    """Short-lived token for opening /api/stream, where it has to travel in the URL.
+
+    It has no "sub", so it is never accepted as a bearer token.
+    """
+    expire = datetime.utcnow() + timedelta(seconds=STREAM_TICKET_EXPIRE_SECONDS)
+    return jwt.encode({"stream": str(user_id), "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+def decode_stream_ticket(ticket: str) -> Optional[int]:
+    payload = decode_access_token(ticket)
+    if payload is None or payload.get("stream") is None:
+        return None
+    return int(payload["stream"])
+
 def get_user_from_token(token: str):
     payload = decode_access_token(token)
     if payload is None:
@@ -0,0 +1,204 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+import logging
+import math
+import os
+import time
+
+from sqlalchemy import func
+
+from database import engine as db_engine, init_db, DBSession
+from models import Backtest, BacktestStatus, Strategy
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = int(os.environ.get('BACKTEST_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+POLL_INTERVAL = float(os.environ.get('BACKTEST_POLL_INTERVAL', 2.0))
+# A RUNNING row whose heartbeat is older than this is taken to belong to a dead worker
+STALE_AFTER = float(os.environ.get('BACKTEST_STALE_AFTER', 60.0))
+EQUITY_POINTS = 500
+
+
+def _clean(value):
+    """Stats come back as numpy scalars and may be NaN; store plain floats or NULL"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+def _update(backtest_id: int, **fields):
+    with DBSession() as db:
+        db.query(Backtest).filter(Backtest.id == backtest_id).update(fields, synchronize_session=False)
+        db.commit()
+
+
+def load_candles(exchange: str, symbol: str, timeframe: str, start: datetime, end: datetime):
+    """OHLCV for [start, end] memory-mapped from the local candle store, fetching only what is missing"""
+    from candle_store import candle_store
+    return candle_store.load_arrays(exchange, symbol, timeframe, start, end).to_frame()
+
+
+def run_backtest_job(backtest_id: int):
+    """Run one claimed backtest row and write its stats back; runs inside a pool process"""
+    from backtesting import BacktestEngine, simple_ma_crossover_strategy
+    from conditions import compiled_strategy
+    from strategy_runner import ma_periods
+
+    try:
+        with DBSession() as db:
+            backtest = db.query(Backtest).filter(Backtest.id == backtest_id).first()
+            strategy = db.query(Strategy).filter(Strategy.id == backtest.strategy_id).first()
+            if not strategy:
+                raise Exception("Strategy not found")
+            parameters = dict(strategy.parameters or {})
+            compiled = compiled_strategy(strategy.id, strategy.updated_at, strategy.entry_conditions, strategy.exit_conditions)
+            market = (strategy.exchange, strategy.trading_pair, strategy.timeframe)
+            start, end, initial_balance = backtest.start_date, backtest.end_date, backtest.initial_balance
+
+        df = load_candles(*market, start, end)
+        if df.empty:
+            raise Exception(f"No candles for {market[1]} {market[2]} between {start} and {end}")
+        _update(backtest_id, progress=0.5)
+
+        if compiled:
+            signals = compiled.signals(df)
+        else:
+            # Same period keys as live trading, so fast_ma/slow_ma from the strategy form apply too
+            fast, slow = ma_periods(parameters)
+            signals = simple_ma_crossover_strategy(df, fast_period=fast, slow_period=slow)['position']
+        engine = BacktestEngine(initial_capital=initial_balance, fee_pct=parameters.get('fee_pct', 0.001), max_positions=1)
+        engine.run_vectorized(df['timestamp'], df['close'], signals, risk_pct=parameters.get('risk_pct', 10))
+        stats = engine.get_stats()
+        _update(backtest_id, progress=0.9)
+
+        step = max(1, len(engine.equity_curve) // EQUITY_POINTS)
+        results_data = {
+            'trades': [{
+                'entry_time': t.entry_time.isoformat(),
+                'exit_time': t.exit_time.isoformat(),
+                'entry_price': t.entry_price,
+                'exit_price': t.exit_price,
+                'size': t.size,
+                'pnl': t.pnl,
+                'pnl_pct': t.pnl_pct,
+                'fees': t.fees
+            } for t in engine.closed_trades],
+            'equity_curve': [[engine.timestamps[i].isoformat(), engine.equity_curve[i]]
+                             for i in range(0, len(engine.equity_curve), step)]
+        }
+        _update(
+            backtest_id,
+            status=BacktestStatus.COMPLETED,
+            progress=1.0,
+            final_balance=_clean(engine.capital),
+            total_return_pct=_clean(stats.get('total_return_pct')),
+            total_trades=stats['total_trades'],
+            winning_trades=stats.get('winning_trades', 0),
+            losing_trades=stats.get('losing_trades', 0),
+            win_rate=_clean(stats.get('win_rate')),
+            avg_win=_clean(stats.get('avg_win')),
+            avg_loss=_clean(stats.get('avg_loss')),
+            largest_win=_clean(stats.get('largest_win')),
+            largest_loss=_clean(stats.get('largest_loss')),
+            profit_factor=_clean(stats.get('profit_factor')),
+            sharpe_ratio=_clean(stats.get('sharpe_ratio')),
+            max_drawdown=_clean(stats.get('max_drawdown_pct')),
+            results_data=results_data,
+            completed_at=datetime.utcnow()
+        )
+    except Exception as e:
+        logger.error(f"Backtest {backtest_id} failed: {str(e)}")
+        _update(backtest_id, status=BacktestStatus.FAILED, error_message=str(e), completed_at=datetime.utcnow())
+
+
+def _init_pool_process():
+    # Pooled connections inherited through fork belong to the parent
+    db_engine.dispose(close=False)
+
+
+class BacktestWorker:
+    """Claims PENDING backtests and runs at most max_workers of them at a time.
+
+    Each worker keeps heartbeat_at fresh on the rows it is running, so several workers
+    can share the queue and only rows whose worker has stopped beating get requeued.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, poll_interval: float = POLL_INTERVAL,
+                 stale_after: float = STALE_AFTER):
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+
+    def recover(self):
+        """Requeue rows left RUNNING by a worker that died mid-job"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        with DBSession() as db:
+            count = db.query(Backtest).filter(
+                Backtest.status == BacktestStatus.RUNNING,
+                func.coalesce(Backtest.heartbeat_at, Backtest.started_at, Backtest.created_at) < cutoff
+            ).update({Backtest.status: BacktestStatus.PENDING, Backtest.progress: 0.0}, synchronize_session=False)
+            db.commit()
+        if count:
+            logger.info(f"Requeued {count} interrupted backtests")
+
+    @staticmethod
+    def heartbeat(backtest_ids):
+        if not backtest_ids:
+            return
+        with DBSession() as db:
+            db.query(Backtest).filter(
+                Backtest.id.in_(list(backtest_ids)),
+                Backtest.status == BacktestStatus.RUNNING
+            ).update({Backtest.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+
+    def claim(self, limit: int) -> list:
+        """Move up to `limit` PENDING rows to RUNNING; the status check keeps concurrent workers apart"""
+        claimed = []
+        with DBSession() as db:
+            ids = [row.id for row in db.query(Backtest.id).filter(
+                Backtest.status == BacktestStatus.PENDING
+            ).order_by(Backtest.created_at).limit(limit)]
+            for backtest_id in ids:
+                updated = db.query(Backtest).filter(
+                    Backtest.id == backtest_id,
+                    Backtest.status == BacktestStatus.PENDING
+                ).update({Backtest.status: BacktestStatus.RUNNING, Backtest.progress: 0.1,
+                          Backtest.started_at: datetime.utcnow(), Backtest.heartbeat_at: datetime.utcnow()},
+                         synchronize_session=False)
+                db.commit()
+                if updated:
+                    claimed.append(backtest_id)
+        return claimed
+
+    def run_forever(self):
+        running = {}
+        recovered = 0.0
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_pool_process) as pool:
+            while True:
+                self.heartbeat(running.values())
+                if time.monotonic() - recovered >= self.stale_after / 2:
+                    self.recover()
+                    recovered = time.monotonic()
+                free = self.max_workers - len(running)
+                if free > 0:
+                    for backtest_id in self.claim(free):
+                        logger.info(f"Starting backtest {backtest_id}")
+                        running[pool.submit(run_backtest_job, backtest_id)] = backtest_id
+                if not running:
+                    time.sleep(self.poll_interval)
+                    continue
+                done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    backtest_id = running.pop(future)
+                    if future.exception():
+                        logger.error(f"Backtest {backtest_id} process crashed: {future.exception()}")
+                        _update(backtest_id, status=BacktestStatus.FAILED, error_message=str(future.exception()),
+                                completed_at=datetime.utcnow())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    BacktestWorker().run_forever()
@@ -86,7 +86,55 @@ class BacktestEngine:
         total_equity = self.capital + unrealized_pnl
         self.equity_curve.append(total_equity)
         self.timestamps.append(timestamp)
-    
+
+    def run_vectorized(self, timestamps, prices, signals, side: OrderSide = OrderSide.BUY, size: Optional[float] = None,
+                       risk_pct: float = 2.0, entry_signal: float = 2, exit_signal: float = -2, close_at_end: bool = True):
+        """Run a whole signal array in one pass, e.g. the `position` column of simple_ma_crossover_strategy.
+
+        Produces the same trades, capital and equity curve as calling open_position / close_position /
+        update_equity row by row. Only bars carrying an entry or exit signal go through the position
+        bookkeeping (capital compounds trade to trade); the per-bar equity curve is built with array ops.
+        """
+        timestamps = pd.Index(timestamps)
+        prices = np.asarray(prices, dtype=float)
+        signals = np.asarray(signals, dtype=float)
+        n = len(prices)
+        start_capital = self.capital
+        # [trade, first bar held, first bar no longer held]
+        spans = [[pos, 0, n] for pos in self.positions]
+        open_spans = list(spans)
+        event_bars = []
+        event_capital = []
+        candidates = np.flatnonzero((signals == entry_signal) | (signals == exit_signal))
+        for i, timestamp, price in zip(candidates.tolist(), timestamps[candidates], prices[candidates].tolist()):
+            if signals[i] == entry_signal:
+                if not self.can_open_position() or not self.open_position(timestamp, price, side, size=size, risk_pct=risk_pct):
+                    continue
+                span = [self.positions[-1], i, n]
+                spans.append(span)
+                open_spans.append(span)
+            else:
+                if not self.positions:
+                    continue
+                self.close_position(timestamp, price)
+                open_spans.pop(0)[2] = i
+            event_bars.append(i)
+            event_capital.append(self.capital)
+        # Capital is a step function of the events; positions add their unrealized P&L while held
+        capital = np.array([start_capital] + event_capital, dtype=float)
+        equity = capital[np.searchsorted(np.array(event_bars, dtype=np.int64), np.arange(n), side='right')]
+        unrealized = np.zeros(n)
+        for pos, start, stop in spans:
+            if pos.side == OrderSide.BUY:
+                unrealized[start:stop] += (prices[start:stop] - pos.entry_price) * pos.size
+            else:
+                unrealized[start:stop] += (pos.entry_price - prices[start:stop]) * pos.size
+        self.equity_curve.extend((equity + unrealized).tolist())
+        self.timestamps.extend(timestamps)
+        if close_at_end and n:
+            while self.positions:
+                self.close_position(timestamps[-1], float(prices[-1]))
+
     def get_stats(self) -> Dict:
         if not self.closed_trades:
             return {'total_trades': 0, 'error': 'No closed trades'}
@@ -143,7 +191,7 @@ def simple_ma_crossover_strategy(df: pd.DataFrame, fast_period: int = 10, slow_p
     df['position'] = df['signal'].diff()
     return df
 
-def run_backtest_example():
+def run_backtest_example(vectorized: bool = True):
     from market_data import MarketDataProvider
     print("🔄 Fetching historical data...")
     provider = MarketDataProvider()
@@ -152,6 +200,13 @@ def run_backtest_example():
     df = simple_ma_crossover_strategy(df, fast_period=10, slow_period=30)
     engine = BacktestEngine(initial_capital=10000, fee_pct=0.001, max_positions=1)
     print("🚀 Running backtest...")
+    if vectorized:
+        engine.run_vectorized(df['timestamp'], df['close'], df['position'], risk_pct=10)
+        for t in engine.closed_trades:
+            print(f"  📈 BUY @ ${t.entry_price:,.2f} on {t.entry_time}")
+            print(f"  📉 SELL @ ${t.exit_price:,.2f} on {t.exit_time}")
+        engine.print_report()
+        return
     for idx, row in df.iterrows():
         timestamp = row['timestamp']
         price = row['close']
@@ -0,0 +1,310 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: only the in-process lock applies
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+from exchange_api import ExchangeAPI
+
+DATA_DIR = os.environ.get('CANDLE_DATA_DIR', os.path.join('user_data', 'data'))
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+SCHEMA = pa.schema([('timestamp', pa.int64())] + [(c, pa.float64()) for c in COLUMNS[1:]])
+# Segment files a market may collect before they are merged into its main file
+COMPACT_SEGMENTS = int(os.environ.get('CANDLE_COMPACT_SEGMENTS', 64))
+
+
+def to_ms(value) -> int:
+    """Milliseconds since epoch for a naive-UTC datetime, pandas Timestamp or ms int"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime) and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+@dataclass
+class CandleArrays:
+    """Read-only OHLCV column views over a memory-mapped candle file.
+
+    path is None when the rows were assembled from the main file and its segments, so
+    there is no single file a worker process could map for itself.
+    """
+    path: Optional[str]
+    start: int
+    stop: int
+    timestamp: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def slice(self, start: int, stop: int) -> 'CandleArrays':
+        columns = {c: getattr(self, c)[start:stop] for c in COLUMNS}
+        return CandleArrays(path=self.path, start=self.start + start, stop=self.start + start + len(columns['close']), **columns)
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame over the same pages, shaped like ExchangeAPI.get_ohlcv"""
+        return pd.DataFrame({c: getattr(self, c) for c in COLUMNS}, copy=False)
+
+
+def map_candles(path: str, start: int = 0, stop: Optional[int] = None) -> CandleArrays:
+    """Memory-map a candle file and slice rows [start, stop) without copying.
+
+    Every process that maps the same file shares its pages through the OS page cache.
+    """
+    table = feather.read_table(path, memory_map=True)
+    stop = table.num_rows if stop is None else stop
+    columns = {}
+    for name in COLUMNS:
+        column = table.column(name)
+        # Files written as several record batches cannot be viewed as one array
+        values = column.chunk(0).to_numpy(zero_copy_only=True) if column.num_chunks == 1 else column.to_numpy()
+        columns[name] = values[start:stop]
+    columns['timestamp'] = columns['timestamp'].astype(np.int64, copy=False).view('datetime64[ms]')
+    return CandleArrays(path=path, start=start, stop=stop, **columns)
+
+
+def _segment_range(name: str) -> Tuple[int, int]:
+    covered_from, covered_to = name[:-len('.feather')].split('-')
+    return int(covered_from), int(covered_to)
+
+
+@contextmanager
+def _file_lock(path: str, exclusive: bool):
+    """flock on path + '.lock', shared between the web, runner and worker processes"""
+    with open(f"{path}.lock", 'a') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+class CandleStore:
+    """OHLCV history on local disk, per exchange/symbol/timeframe.
+
+    Each market has a main Feather file and a directory of append-only segment files,
+    each named for the time range it covers. An update fetches only the part of the
+    requested range that is not covered yet and writes it as a new segment, so a per-bar
+    refresh costs the new bars rather than a rewrite of the whole history; once
+    COMPACT_SEGMENTS segments pile up they are merged into the main file. Writers hold an
+    exclusive flock and readers a shared one, and every file is written under a temporary
+    name and renamed into place, so processes sharing the directory never see a partial
+    file or a half-finished compaction.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR, page_size: int = 1000, compact_segments: int = COMPACT_SEGMENTS):
+        self.data_dir = data_dir
+        self.page_size = page_size
+        self.compact_segments = compact_segments
+        self._apis: Dict[str, ExchangeAPI] = {}
+        self._lock = threading.Lock()
+
+    def path(self, exchange: str, symbol: str, timeframe: str) -> str:
+        name = f"{symbol.replace('/', '_').replace(':', '_')}-{timeframe}.feather"
+        return os.path.join(self.data_dir, exchange.lower(), name)
+
+    @staticmethod
+    def segment_dir(path: str) -> str:
+        return path[:-len('.feather')] + '.segments'
+
+    def _api(self, exchange: str) -> ExchangeAPI:
+        exchange = exchange.lower()
+        if exchange not in self._apis:
+            self._apis[exchange] = ExchangeAPI(exchange, testnet=False)
+        return self._apis[exchange]
+
+    def _snapshot(self, path: str, lock: bool = True):
+        """(main table, its coverage, [(segment coverage, segment table)]) as of one moment"""
+        if not os.path.isdir(os.path.dirname(path)):
+            return None, None, []
+        if lock:
+            with _file_lock(path, exclusive=False):
+                return self._snapshot(path, lock=False)
+        table, coverage = None, None
+        if os.path.exists(path):
+            # A compaction replaces the file by rename, so this mapping stays valid after the lock
+            table = feather.read_table(path, memory_map=True)
+            meta = table.schema.metadata or {}
+            coverage = (int(meta[b'covered_from']), int(meta[b'covered_to'])) if b'covered_from' in meta else None
+        segments = []
+        directory = self.segment_dir(path)
+        if os.path.isdir(directory):
+            names = sorted((n for n in os.listdir(directory) if n.endswith('.feather')), key=_segment_range)
+            for name in names:
+                # Read into memory since a compaction deletes them
+                segments.append((_segment_range(name), feather.read_table(os.path.join(directory, name))))
+        return table, coverage, segments
+
+    @staticmethod
+    def _merge(table: Optional[pa.Table], segments: list) -> pd.DataFrame:
+        """Main file and segment rows as one frame, deduped by timestamp (later files win)"""
+        frames = ([table.to_pandas()] if table is not None else []) + [t.to_pandas() for _, t in segments]
+        if not frames:
+            return pd.DataFrame(columns=COLUMNS)
+        df = pd.concat(frames, ignore_index=True)
+        return df.drop_duplicates('timestamp', keep='last').sort_values('timestamp', kind='stable')
+
+    @staticmethod
+    def _union(coverage: Optional[Tuple[int, int]], segments: list) -> Optional[Tuple[int, int]]:
+        ranges = ([coverage] if coverage else []) + [r for r, _ in segments]
+        if not ranges:
+            return None
+        return min(r[0] for r in ranges), max(r[1] for r in ranges)
+
+    def read_table(self, exchange: str, symbol: str, timeframe: str) -> Tuple[Optional[pa.Table], Optional[Tuple[int, int]]]:
+        """Stored candles and the (from, to) ms range they cover, or (None, None)"""
+        table, coverage, segments = self._snapshot(self.path(exchange, symbol, timeframe))
+        if table is None and not segments:
+            return None, None
+        if segments:
+            table = pa.Table.from_pandas(self._merge(table, segments)[COLUMNS], schema=SCHEMA, preserve_index=False)
+        return table, self._union(coverage, segments)
+
+    @staticmethod
+    def _write_file(path: str, df: pd.DataFrame, coverage: Tuple[int, int]):
+        table = pa.Table.from_pandas(df[COLUMNS], schema=SCHEMA, preserve_index=False)
+        table = table.replace_schema_metadata({'covered_from': str(coverage[0]), 'covered_to': str(coverage[1])})
+        # Uncompressed so readers can memory-map the columns; replace atomically for concurrent readers
+        tmp = f"{path}.{os.getpid()}.tmp"
+        feather.write_feather(table, tmp, compression='uncompressed', chunksize=max(table.num_rows, 1))
+        os.replace(tmp, path)
+
+    def _write(self, path: str, df: pd.DataFrame, coverage: Tuple[int, int]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write_file(path, df, coverage)
+
+    def _append(self, path: str, df: pd.DataFrame, coverage: Tuple[int, int]):
+        """Add fetched rows as a segment covering `coverage`; caller holds the exclusive lock"""
+        directory = self.segment_dir(path)
+        os.makedirs(directory, exist_ok=True)
+        self._write_file(os.path.join(directory, f"{coverage[0]}-{coverage[1]}.feather"), df, coverage)
+
+    def compact(self, path: str):
+        """Merge a market's segments into its main file; caller holds the exclusive lock"""
+        table, coverage, segments = self._snapshot(path, lock=False)
+        if not segments:
+            return
+        self._write(path, self._merge(table, segments), self._union(coverage, segments))
+        directory = self.segment_dir(path)
+        # Only after the main file holds their rows
+        for (covered_from, covered_to), _ in segments:
+            os.remove(os.path.join(directory, f"{covered_from}-{covered_to}.feather"))
+
+    def missing_ranges(self, coverage: Optional[Tuple[int, int]], start: int, end: int) -> List[Tuple[int, int]]:
+        if coverage is None:
+            return [(start, end)]
+        ranges = []
+        if start < coverage[0]:
+            ranges.append((start, coverage[0] - 1))
+        if end > coverage[1]:
+            ranges.append((coverage[1] + 1, end))
+        return ranges
+
+    def update(self, exchange: str, symbol: str, timeframe: str, start, end=None) -> Tuple[int, int]:
+        """Fetch whatever part of [start, end] is not on disk yet and return the clamped (start, end) ms"""
+        api = self._api(exchange)
+        step = api.exchange.parse_timeframe(timeframe) * 1000
+        # Never store the candle that is still forming
+        last_closed = (int(time.time() * 1000) // step - 1) * step
+        start = to_ms(start) // step * step
+        end = min(to_ms(end) if end is not None else last_closed, last_closed)
+        if start > end:
+            return start, end
+
+        path = self.path(exchange, symbol, timeframe)
+        with self._lock:
+            table, coverage, segments = self._snapshot(path)
+            ranges = self.missing_ranges(self._union(coverage, segments), start, end)
+            if not ranges:
+                return start, end
+            # Fetched without the file lock so readers are not held up by the exchange; if
+            # another process fetches the same bars, the duplicates are dropped on read
+            fetched = [(since, until, api.fetch_ohlcv_range(symbol, timeframe, since, until, page_size=self.page_size))
+                       for since, until in ranges]
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with _file_lock(path, exclusive=True):
+                for since, until, rows in fetched:
+                    df = pd.DataFrame(rows, columns=COLUMNS).drop_duplicates('timestamp', keep='last')
+                    self._append(path, df.sort_values('timestamp'), (since, until))
+                if not os.path.exists(path) or len(segments) + len(fetched) >= self.compact_segments:
+                    self.compact(path)
+        return start, end
+
+    def get_ohlcv(self, exchange: str, symbol: str, timeframe: str, start, end=None) -> pd.DataFrame:
+        """Candles for [start, end] as a DataFrame shaped like ExchangeAPI.get_ohlcv"""
+        start_ms, end_ms = to_ms(start), to_ms(end) if end is not None else None
+        _, end_ms = self.update(exchange, symbol, timeframe, start_ms, end_ms)
+        table, _ = self.read_table(exchange, symbol, timeframe)
+        if table is None:
+            return pd.DataFrame(columns=COLUMNS)
+        df = table.to_pandas()
+        df = df[(df['timestamp'] >= start_ms) & (df['timestamp'] <= end_ms)].reset_index(drop=True)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
+
+    def load_arrays(self, exchange: str, symbol: str, timeframe: str, start=None, end=None,
+                    fetch: bool = True) -> CandleArrays:
+        """NumPy views of the stored candles in [start, end].
+
+        Zero-copy over the memory-mapped main file when it covers the range; otherwise
+        the window is assembled from the main file and the segments, copying only its rows.
+        """
+        if fetch and start is not None:
+            self.update(exchange, symbol, timeframe, start, end)
+        path = self.path(exchange, symbol, timeframe)
+        table, coverage, segments = self._snapshot(path)
+        if table is None and not segments:
+            raise Exception(f"No candles stored for {exchange} {symbol} {timeframe}")
+        start_ms = to_ms(start) if start is not None else None
+        end_ms = to_ms(end) if end is not None else None
+        in_main = table is not None and (not segments or (
+            coverage and start_ms is not None and end_ms is not None and coverage[0] <= start_ms and end_ms <= coverage[1]))
+        candles = map_candles(path) if in_main else self._window(table, segments, start_ms, end_ms)
+        timestamps = candles.timestamp.view(np.int64)
+        first = int(np.searchsorted(timestamps, start_ms)) if start is not None else 0
+        last = int(np.searchsorted(timestamps, end_ms, side='right')) if end is not None else len(timestamps)
+        return candles.slice(first, last)
+
+    def _window(self, table: Optional[pa.Table], segments: list, start_ms: Optional[int],
+                end_ms: Optional[int]) -> CandleArrays:
+        """Rows of the main file and segments in [start_ms, end_ms], merged into fresh arrays"""
+        if table is not None and start_ms is not None:
+            # Only the tail of the main file the window needs is converted
+            timestamps = table.column('timestamp').to_numpy()
+            table = table.slice(int(np.searchsorted(timestamps, start_ms)))
+        df = self._merge(table, [(r, t) for r, t in segments
+                                 if (start_ms is None or r[1] >= start_ms) and (end_ms is None or r[0] <= end_ms)])
+        columns = {c: df[c].to_numpy(dtype=np.int64 if c == 'timestamp' else np.float64) for c in COLUMNS}
+        columns['timestamp'] = columns['timestamp'].view('datetime64[ms]')
+        return CandleArrays(path=None, start=0, stop=len(df), **columns)
+
+
+# Shared instance
+candle_store = CandleStore()
+
+
+if __name__ == "__main__":
+    from datetime import timedelta
+    start = datetime.utcnow() - timedelta(days=90)
+    t0 = time.time()
+    df = candle_store.get_ohlcv('binance', 'BTC/USDT', '1h', start)
+    print(f"Loaded {len(df)} candles in {time.time() - t0:.2f}s")
+    t0 = time.time()
+    df = candle_store.get_ohlcv('binance', 'BTC/USDT', '1h', start)
+    print(f"Reloaded {len(df)} candles from disk in {time.time() - t0:.2f}s")
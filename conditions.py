@@ -0,0 +1,234 @@
+"""Condition grammar for Strategy.entry_conditions / exit_conditions.
+
+Operands:
+    3.5                                        a constant
+    "close"                                    a candle column (open/high/low/close/volume)
+    {"indicator": "sma", "period": 20}         sma, ema or rsi; "source" defaults to "close"
+
+Conditions:
+    {"left": <operand>, "op": ">", "right": <operand>}     >, >=, <, <=, ==
+    {"left": ..., "op": "crosses_above", "right": ...}     also crosses_below
+    {"all": [<condition>, ...]}, {"any": [...]}, {"not": <condition>}
+    [<condition>, ...]                                     shorthand for "all"
+
+Example: {"all": [{"left": {"indicator": "ema", "period": 12}, "op": "crosses_above",
+                   "right": {"indicator": "ema", "period": 26}},
+                  {"left": {"indicator": "rsi", "period": 14}, "op": "<", "right": 70}]}
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import threading
+
+import numpy as np
+
+from indicators import INDICATORS, indicator_service
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+COMPARISONS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+}
+CROSSES = ('crosses_above', 'crosses_below')
+# EMA/RSI depend on all earlier bars; this many periods of history makes the cut-off negligible
+EWM_WARMUP = 5
+COMPILED_CACHE_SIZE = 1000
+
+
+class Evaluation:
+    """One pass over a candle set: columns are read once and indicators shared between nodes.
+
+    With a market (exchange, symbol, timeframe) indicators come from the shared
+    indicator_service, so strategies on the same market reuse each other's series.
+    """
+
+    def __init__(self, candles, market: Optional[tuple] = None):
+        self.candles = candles
+        self.market = market
+        self.series: Dict[tuple, np.ndarray] = {}
+
+    def column(self, name: str) -> np.ndarray:
+        key = ('column', name)
+        if key not in self.series:
+            self.series[key] = np.asarray(getattr(self.candles, name), dtype=float)
+        return self.series[key]
+
+    def indicator(self, name: str, period: int, source: str) -> np.ndarray:
+        key = (name, period, source)
+        if key not in self.series:
+            if self.market:
+                self.series[key] = indicator_service.get(self.market, name, period, self.candles.timestamp,
+                                                         self.column(source), source)
+            else:
+                self.series[key] = INDICATORS[name].compute(self.column(source), period)
+        return self.series[key]
+
+
+class Operand:
+    def __init__(self, spec):
+        if isinstance(spec, bool) or not isinstance(spec, (int, float, str, dict)):
+            raise Exception(f"Invalid operand: {spec!r}")
+        self.constant = float(spec) if isinstance(spec, (int, float)) else None
+        self.column = spec if isinstance(spec, str) else None
+        self.indicator = None
+        if self.column is not None and self.column not in PRICE_COLUMNS:
+            raise Exception(f"Unknown column: {spec}")
+        if isinstance(spec, dict):
+            self.indicator = spec.get('indicator')
+            self.period = spec.get('period')
+            self.source = spec.get('source', 'close')
+            if self.indicator not in INDICATORS:
+                raise Exception(f"Unknown indicator: {self.indicator}")
+            if not isinstance(self.period, int) or isinstance(self.period, bool) or self.period < 1:
+                raise Exception(f"Indicator period must be a positive integer: {spec!r}")
+            if self.source not in PRICE_COLUMNS:
+                raise Exception(f"Unknown column: {self.source}")
+
+    @property
+    def lookback(self) -> int:
+        if self.indicator == 'sma':
+            return self.period
+        if self.indicator:
+            return self.period * EWM_WARMUP
+        return 1
+
+    def values(self, ev: Evaluation):
+        if self.constant is not None:
+            return self.constant
+        if self.column is not None:
+            return ev.column(self.column)
+        return ev.indicator(self.indicator, self.period, self.source)
+
+
+class Node:
+    lookback = 1
+
+    def evaluate(self, ev: Evaluation) -> np.ndarray:
+        raise NotImplementedError
+
+
+class Compare(Node):
+    def __init__(self, left, op, right):
+        self.left, self.right = Operand(left), Operand(right)
+        self.op = op
+        self.lookback = max(self.left.lookback, self.right.lookback) + (1 if op in CROSSES else 0)
+
+    def evaluate(self, ev):
+        left, right = self.left.values(ev), self.right.values(ev)
+        n = len(ev.column('close'))
+        left = np.broadcast_to(left, n)
+        right = np.broadcast_to(right, n)
+        if self.op in COMPARISONS:
+            return COMPARISONS[self.op](left, right)
+        above = left > right
+        below = left < right
+        now, before = (above, ~above) if self.op == 'crosses_above' else (below, ~below)
+        out = np.zeros(n, dtype=bool)
+        # NaN on the previous bar (indicator still warming up) is not a cross
+        prev_valid = ~(np.isnan(left[:-1]) | np.isnan(right[:-1]))
+        out[1:] = now[1:] & before[:-1] & prev_valid
+        return out
+
+
+class All(Node):
+    def __init__(self, children: List[Node]):
+        self.children = children
+        self.lookback = max((c.lookback for c in children), default=1)
+
+    def evaluate(self, ev):
+        n = len(ev.column('close'))
+        return np.logical_and.reduce([c.evaluate(ev) for c in self.children]) if self.children else np.ones(n, dtype=bool)
+
+
+class Any(Node):
+    def __init__(self, children: List[Node]):
+        self.children = children
+        self.lookback = max((c.lookback for c in children), default=1)
+
+    def evaluate(self, ev):
+        n = len(ev.column('close'))
+        return np.logical_or.reduce([c.evaluate(ev) for c in self.children]) if self.children else np.zeros(n, dtype=bool)
+
+
+class Not(Node):
+    def __init__(self, child: Node):
+        self.child = child
+        self.lookback = child.lookback
+
+    def evaluate(self, ev):
+        return ~self.child.evaluate(ev)
+
+
+def compile_condition(spec) -> Node:
+    """Parse a condition spec into an evaluable tree; raises on anything outside the grammar"""
+    if isinstance(spec, list):
+        return All([compile_condition(s) for s in spec])
+    if not isinstance(spec, dict):
+        raise Exception(f"Invalid condition: {spec!r}")
+    if 'all' in spec or 'any' in spec:
+        children = spec.get('all', spec.get('any'))
+        if not isinstance(children, list):
+            raise Exception(f"'all'/'any' takes a list of conditions: {spec!r}")
+        return (All if 'all' in spec else Any)([compile_condition(s) for s in children])
+    if 'not' in spec:
+        return Not(compile_condition(spec['not']))
+    op = spec.get('op')
+    if op not in COMPARISONS and op not in CROSSES:
+        raise Exception(f"Unknown operator: {op!r}")
+    if 'left' not in spec or 'right' not in spec:
+        raise Exception(f"Comparison needs 'left' and 'right': {spec!r}")
+    return Compare(spec['left'], op, spec['right'])
+
+
+class CompiledStrategy:
+    """Entry/exit conditions compiled once; evaluates a whole candle set with array ops.
+
+    signals() returns the run_vectorized convention: 2 where entry holds, -2 where exit
+    holds (exit wins if both do), 0 elsewhere. Candles may be a DataFrame or CandleArrays;
+    pass `market` to share indicator series through indicator_service.
+    """
+
+    def __init__(self, entry_conditions, exit_conditions=None):
+        self.entry = compile_condition(entry_conditions)
+        self.exit = compile_condition(exit_conditions) if exit_conditions else None
+        self.lookback = max(self.entry.lookback, self.exit.lookback if self.exit else 1) + 1
+
+    def signals(self, candles, market: Optional[tuple] = None) -> np.ndarray:
+        ev = Evaluation(candles, market)
+        out = np.where(self.entry.evaluate(ev), 2, 0)
+        if self.exit:
+            out[self.exit.evaluate(ev)] = -2
+        return out
+
+    def last_signal(self, candles, market: Optional[tuple] = None) -> int:
+        """Signal on the final bar, for live evaluation over at least `lookback` candles"""
+        signals = self.signals(candles, market)
+        return int(signals[-1]) if len(signals) else 0
+
+
+_compiled: 'OrderedDict[int, tuple]' = OrderedDict()
+_lock = threading.Lock()
+
+
+def compiled_strategy(strategy_id: int, version, entry_conditions, exit_conditions=None) -> Optional[CompiledStrategy]:
+    """CompiledStrategy for a strategy row, reused until its version (updated_at) changes.
+
+    None if the strategy has no entry conditions.
+    """
+    if not entry_conditions:
+        return None
+    with _lock:
+        cached = _compiled.get(strategy_id)
+        if cached and cached[0] == version:
+            _compiled.move_to_end(strategy_id)
+            return cached[1]
+    compiled = CompiledStrategy(entry_conditions, exit_conditions)
+    with _lock:
+        _compiled[strategy_id] = (version, compiled)
+        _compiled.move_to_end(strategy_id)
+        while len(_compiled) > COMPILED_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return compiled
@@ -1,18 +1,60 @@
-﻿from sqlalchemy import create_engine
+﻿from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, scoped_session
 from models import Base
 import os
 
 DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///trading.db')
 
+# SQLite profile for several worker processes sharing one file; SQLITE_TUNING=0 turns it off
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') == '1'
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 10000))
+
 engine = create_engine(DATABASE_URL, echo=False, pool_pre_ping=True, pool_recycle=3600)
+
+if engine.dialect.name == 'sqlite' and SQLITE_TUNING:
+    @event.listens_for(engine, 'connect')
+    def _sqlite_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL: readers see the last commit and never wait for the writer, or it for them
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+        cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+        cursor.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+        # Writers from other processes wait their turn for the write lock instead of failing
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 db_session = scoped_session(SessionLocal)
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    add_missing_indexes()
     print("✅ Database initialized successfully")
 
+def add_missing_columns():
+    """create_all skips existing tables, so add columns introduced after a table was created"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def add_missing_indexes():
+    """create_all also skips the indexes of existing tables"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -1,7 +1,12 @@
 ﻿import ccxt
 from typing import Optional, Dict, List
 from datetime import datetime, timedelta
+import time
 import pandas as pd
+from market_feed import get_feed
+
+# How long REST 24h stats are reused under live prices from the market feed
+TICKER_STATS_TTL = 60
 
 class ExchangeAPI:
     """Unified exchange API wrapper using CCXT"""
@@ -26,12 +31,19 @@ class ExchangeAPI:
             config['options']['sandboxMode'] = True
         
         self.exchange = exchange_class(config)
+        self._stats = {}
         
     def get_ticker(self, symbol: str) -> Dict:
-        """Get current price and 24h stats for a symbol"""
+        """Get current price and 24h stats for a symbol, live from the market feed if one is running"""
+        feed = get_feed(self.exchange_name)
+        live = feed.ticker(symbol) if feed else None
+        if live and live['last_price'] is not None:
+            stats = self._stats.get(symbol)
+            if stats and time.monotonic() - stats[0] < TICKER_STATS_TTL:
+                return {**stats[1], **live}
         try:
             ticker = self.exchange.fetch_ticker(symbol)
-            return {
+            result = {
                 'symbol': symbol,
                 'last_price': ticker['last'],
                 'bid': ticker['bid'],
@@ -43,22 +55,48 @@ class ExchangeAPI:
                 'change_pct_24h': ticker['percentage'],
                 'timestamp': ticker['timestamp']
             }
+            self._stats[symbol] = (time.monotonic(), result)
+            return {**result, **live} if live and live['last_price'] is not None else result
         except Exception as e:
             raise Exception(f"Error fetching ticker for {symbol}: {str(e)}")
     
     def get_ohlcv(self, symbol: str, timeframe: str = '1h', 
-                   limit: int = 100) -> pd.DataFrame:
-        """Get historical OHLCV data"""
+                   limit: int = 100, since: Optional[int] = None) -> pd.DataFrame:
+        """Get historical OHLCV data, optionally starting at `since` (ms)"""
         try:
-            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
             df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
             df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
             return df
         except Exception as e:
             raise Exception(f"Error fetching OHLCV for {symbol}: {str(e)}")
     
+    def fetch_ohlcv_range(self, symbol: str, timeframe: str, since: int, until: int,
+                          page_size: int = 1000) -> List[list]:
+        """Raw OHLCV rows with open time in [since, until] (ms), paging through the history"""
+        try:
+            step = self.exchange.parse_timeframe(timeframe) * 1000
+            rows = []
+            cursor = since
+            while cursor <= until:
+                page = self.exchange.fetch_ohlcv(symbol, timeframe, since=cursor, limit=page_size)
+                if not page:
+                    break
+                rows.extend(r for r in page if cursor <= r[0] <= until)
+                next_cursor = page[-1][0] + step
+                if next_cursor <= cursor:
+                    break
+                cursor = next_cursor
+            return rows
+        except Exception as e:
+            raise Exception(f"Error fetching OHLCV for {symbol}: {str(e)}")
+    
     def get_orderbook(self, symbol: str, limit: int = 20) -> Dict:
-        """Get current orderbook"""
+        """Get current orderbook, from the market feed's local book if one is running"""
+        feed = get_feed(self.exchange_name)
+        book = feed.orderbook(symbol, limit) if feed else None
+        if book:
+            return book
         try:
             orderbook = self.exchange.fetch_order_book(symbol, limit)
             return {
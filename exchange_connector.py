@@ -1,7 +1,136 @@
 import ccxt
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
 from api_key_manager import key_manager
 from models import APIKey
 from database import DBSession
+from ticker_cache import ticker_cache
+
+CLIENT_TTL = float(os.environ.get('EXCHANGE_CLIENT_TTL', 300))
+CLIENT_CACHE_SIZE = int(os.environ.get('EXCHANGE_CLIENT_CACHE_SIZE', 256))
+MARKETS_TTL = float(os.environ.get('EXCHANGE_MARKETS_TTL', 3600))
+TICKER_FETCH_THREADS = int(os.environ.get('TICKER_FETCH_THREADS', 8))
+
+class ExchangeClientPool:
+    '''Process-wide LRU of live ccxt clients keyed by (user_id, exchange).
+
+    Building a client costs two Fernet decryptions and a load_markets call; cached
+    clients skip both until they expire or their key changes. Each checkout reads the
+    key's id and updated_at, so a key rotated or deleted through any worker process
+    stops being used everywhere at once, not only in the worker that handled the change.
+    Market metadata is shared between all clients of the same exchange.
+    user_id None gives an unauthenticated client for public market data.
+    '''
+
+    def __init__(self, ttl=CLIENT_TTL, max_size=CLIENT_CACHE_SIZE, markets_ttl=MARKETS_TTL):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.markets_ttl = markets_ttl
+        self._clients = OrderedDict()
+        self._markets = {}
+        self._lock = threading.Lock()
+        # Called with (user_id, exchange_name) on invalidate, e.g. by the async pool
+        self.listeners = []
+
+    def get(self, user_id, exchange_name):
+        key = (user_id, exchange_name)
+        version = self.key_version(user_id, exchange_name)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry and now - entry[1] < self.ttl and entry[2] == version:
+                self._clients.move_to_end(key)
+                return entry[0]
+            self._clients.pop(key, None)
+
+        client = self._create(user_id, exchange_name)
+        with self._lock:
+            self._clients[key] = (client, now, version)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+        return client
+
+    def invalidate(self, user_id, exchange_name=None):
+        '''Drop cached clients after a user's API key is stored or deleted'''
+        with self._lock:
+            for key in [k for k in self._clients if k[0] == user_id and exchange_name in (None, k[1])]:
+                del self._clients[key]
+        for listener in self.listeners:
+            listener(user_id, exchange_name)
+
+    def key_version(self, user_id, exchange_name):
+        '''(id, updated_at) of the user's active API key, () for public clients; raises if there is none'''
+        if user_id is None:
+            return ()
+        with DBSession() as db:
+            row = db.query(APIKey.id, APIKey.updated_at).filter(
+                APIKey.user_id == user_id,
+                APIKey.exchange == exchange_name,
+                APIKey.is_active == True
+            ).first()
+        if not row:
+            self.invalidate(user_id, exchange_name)
+            raise Exception(f'No active API key found for {exchange_name}')
+        return tuple(row)
+
+    def _create(self, user_id, exchange_name):
+        exchange_class = getattr(ccxt, exchange_name)
+        client = exchange_class(self.config(user_id, exchange_name))
+        self._share_markets(client, exchange_name)
+        return client
+
+    def config(self, user_id, exchange_name):
+        '''ccxt constructor options, with the user's decrypted API key if user_id is given'''
+        config = {
+            'enableRateLimit': True,
+            'options': {'defaultType': 'spot'}
+        }
+        if user_id is not None:
+            with DBSession() as db:
+                api_key = db.query(APIKey).filter(
+                    APIKey.user_id == user_id,
+                    APIKey.exchange == exchange_name,
+                    APIKey.is_active == True
+                ).first()
+
+                if not api_key:
+                    raise Exception(f'No active API key found for {exchange_name}')
+
+                # Decrypt keys
+                config['apiKey'] = key_manager.decrypt(api_key.encrypted_key)
+                config['secret'] = key_manager.decrypt(api_key.encrypted_secret)
+        return config
+
+    def _share_markets(self, client, exchange_name):
+        cached = self.cached_markets(exchange_name)
+        if cached:
+            client.set_markets(*cached)
+            return
+        try:
+            client.load_markets()
+        except Exception:
+            # Leave it to ccxt to load lazily on first call
+            return
+        self.store_markets(exchange_name, client)
+
+    def cached_markets(self, exchange_name):
+        '''(markets, currencies) loaded by any client of this exchange, or None if stale'''
+        with self._lock:
+            cached = self._markets.get(exchange_name)
+        if cached and time.monotonic() - cached[2] < self.markets_ttl:
+            return cached[0], cached[1]
+        return None
+
+    def store_markets(self, exchange_name, client):
+        with self._lock:
+            self._markets[exchange_name] = (client.markets, client.currencies, time.monotonic())
+
+# Singleton instance
+client_pool = ExchangeClientPool()
 
 class ExchangeConnector:
     def __init__(self, user_id, exchange_name='gemini'):
@@ -10,31 +139,9 @@ class ExchangeConnector:
         self.exchange = None
         
     def connect(self):
-        '''Connect to exchange using encrypted API keys'''
-        with DBSession() as db:
-            api_key = db.query(APIKey).filter(
-                APIKey.user_id == self.user_id,
-                APIKey.exchange == self.exchange_name,
-                APIKey.is_active == True
-            ).first()
-            
-            if not api_key:
-                raise Exception(f'No active API key found for {self.exchange_name}')
-            
-            # Decrypt keys
-            key = key_manager.decrypt(api_key.encrypted_key)
-            secret = key_manager.decrypt(api_key.encrypted_secret)
-            
-            # Initialize exchange
-            exchange_class = getattr(ccxt, self.exchange_name)
-            self.exchange = exchange_class({
-                'apiKey': key,
-                'secret': secret,
-                'enableRateLimit': True,
-                'options': {'defaultType': 'spot'}
-            })
-            
-            return self.exchange
+        '''Connect to exchange using encrypted API keys (cached per user and exchange)'''
+        self.exchange = client_pool.get(self.user_id, self.exchange_name)
+        return self.exchange
     
     def get_balance(self):
         '''Get account balance'''
@@ -54,12 +161,42 @@ class ExchangeConnector:
             self.connect()
         return self.exchange.create_market_sell_order(symbol, amount)
     
-    def get_ticker(self, symbol):
-        '''Get current price for symbol'''
+    def get_ticker(self, symbol, max_age=None):
+        '''Get current price for symbol, served from the shared ticker cache when fresh'''
+        return ticker_cache.get(self.exchange_name, symbol, lambda: self._fetch_ticker(symbol), max_age)
+    
+    def _fetch_ticker(self, symbol):
         if not self.exchange:
             self.connect()
         return self.exchange.fetch_ticker(symbol)
     
+    def get_tickers(self, symbols, max_age=None):
+        '''Get tickers for several symbols; cache misses are fetched together'''
+        return ticker_cache.get_many(self.exchange_name, symbols, self._fetch_tickers, max_age)
+    
+    def _fetch_tickers(self, symbols):
+        '''One fetch_tickers call if supported, else concurrent fetches'''
+        if not self.exchange:
+            self.connect()
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return {}
+        if self.exchange.has.get('fetchTickers'):
+            try:
+                return self.exchange.fetch_tickers(symbols)
+            except Exception:
+                # Some exchanges only support fetching all tickers; fall back to per-symbol
+                pass
+        
+        def fetch(symbol):
+            try:
+                return symbol, self.exchange.fetch_ticker(symbol)
+            except Exception:
+                return symbol, None
+        
+        with ThreadPoolExecutor(max_workers=min(TICKER_FETCH_THREADS, len(symbols))) as pool:
+            return {symbol: ticker for symbol, ticker in pool.map(fetch, symbols) if ticker}
+    
     def get_open_orders(self, symbol=None):
         '''Get all open orders'''
         if not self.exchange:
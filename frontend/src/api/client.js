@@ -37,13 +37,25 @@ export const strategyAPI = {
 };
 
 export const backtestAPI = {
-  run: (strategyId, data) => apiClient.post(`/api/strategies/${strategyId}/backtest`, data),
-  getResults: (strategyId) => apiClient.get(`/api/strategies/${strategyId}/backtests`),
+  run: (strategyId, data) => apiClient.post('/api/backtests', { ...data, strategy_id: strategyId }),
+  getResults: (strategyId) => apiClient.get('/api/backtests', { params: { strategy_id: strategyId } }),
+  getOne: (id) => apiClient.get(`/api/backtests/${id}`),
 };
 
 export const tradeAPI = {
   getAll: (params) => apiClient.get('/api/trades', { params }),
   getForStrategy: (strategyId) => apiClient.get(`/api/strategies/${strategyId}/trades`),
+  getPositions: (params) => apiClient.get('/api/trading/positions', { params }),
+};
+
+// Server-Sent Events from the async server. EventSource cannot set headers, so it
+// authenticates with a short-lived stream ticket in the query rather than the JWT
+export const streamAPI = {
+  open: async (params = {}) => {
+    const { data } = await apiClient.post('/api/stream/ticket');
+    const query = new URLSearchParams({ ...params, ticket: data.ticket });
+    return new EventSource(`${API_URL}/api/stream?${query}`);
+  },
 };
 
 export default apiClient;
@@ -1,18 +1,61 @@
 import React, { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
-import { strategyAPI, tradeAPI } from '../api/client';
+import { strategyAPI, tradeAPI, streamAPI } from '../api/client';
 
 export default function Dashboard() {
   const { user, logout } = useAuth();
   const [strategies, setStrategies] = useState([]);
   const [trades, setTrades] = useState([]);
   const [stats, setStats] = useState({ total_pnl: 0, win_rate: 0, total_trades: 0 });
+  const [positions, setPositions] = useState([]);
 
   useEffect(() => {
     loadData();
   }, []);
 
+  useEffect(() => {
+    let stream = null;
+    let poll = null;
+    let cancelled = false;
+
+    const loadPositions = () => tradeAPI.getPositions()
+      .then((res) => setPositions(res.data.positions))
+      .catch((err) => console.error('Error loading positions:', err));
+    // Servers without streaming (or a failed ticket) fall back to polling
+    const startPolling = () => {
+      if (!poll && !cancelled) {
+        loadPositions();
+        poll = setInterval(loadPositions, 10000);
+      }
+    };
+
+    const connect = () => streamAPI.open().then((s) => {
+      if (cancelled) return s.close();
+      stream = s;
+      let opened = false;
+      s.onopen = () => {
+        opened = true;
+        clearInterval(poll);
+        poll = null;
+      };
+      s.addEventListener('positions', (e) => setPositions(JSON.parse(e.data).positions));
+      s.onerror = () => {
+        // CLOSED means the browser will not retry; an expired ticket would fail anyway
+        if (s.readyState !== EventSource.CLOSED) return;
+        startPolling();
+        if (opened) setTimeout(() => !cancelled && connect(), 5000);
+      };
+    }).catch(startPolling);
+
+    connect();
+    return () => {
+      cancelled = true;
+      if (stream) stream.close();
+      clearInterval(poll);
+    };
+  }, []);
+
   const loadData = async () => {
     try {
       const [stratRes, tradeRes] = await Promise.all([strategyAPI.getAll(), tradeAPI.getAll({ limit: 10 })]);
@@ -80,6 +123,31 @@ export default function Dashboard() {
             </div>
           )}
         </div>
+        {positions.length > 0 && (
+          <div style={{ background: '#1a1f3a', padding: '1.5rem', borderRadius: '8px', border: '1px solid #00ff41', marginBottom: '2rem' }}>
+            <h2 style={{ marginTop: 0 }}>OPEN POSITIONS</h2>
+            <table style={{ width: '100%', borderCollapse: 'collapse' }}>
+              <thead>
+                <tr style={{ borderBottom: '1px solid #00ff41' }}>
+                  <th style={{ padding: '0.75rem', textAlign: 'left' }}>PAIR</th>
+                  <th style={{ padding: '0.75rem', textAlign: 'right' }}>ENTRY</th>
+                  <th style={{ padding: '0.75rem', textAlign: 'right' }}>PRICE</th>
+                  <th style={{ padding: '0.75rem', textAlign: 'right' }}>UNREALIZED P&L</th>
+                </tr>
+              </thead>
+              <tbody>
+                {positions.map(p => (
+                  <tr key={p.trade_id} style={{ borderBottom: '1px solid #2a2f4a' }}>
+                    <td style={{ padding: '0.75rem' }}>{p.symbol}</td>
+                    <td style={{ padding: '0.75rem', textAlign: 'right' }}>{p.entry_price}</td>
+                    <td style={{ padding: '0.75rem', textAlign: 'right' }}>{p.current_price}</td>
+                    <td style={{ padding: '0.75rem', textAlign: 'right', color: p.unrealized_pnl >= 0 ? '#00ff41' : '#ff4444' }}>${p.unrealized_pnl.toFixed(2)} ({p.unrealized_pnl_pct.toFixed(2)}%)</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+        )}
         <div style={{ background: '#1a1f3a', padding: '1.5rem', borderRadius: '8px', border: '1px solid #00ff41' }}>
           <h2 style={{ marginTop: 0 }}>RECENT TRADES</h2>
           {trades.length === 0 ? (
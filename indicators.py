@@ -0,0 +1,214 @@
+from collections import OrderedDict, deque
+from typing import Tuple
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Points kept per cached series; trimmed back to this once it doubles
+INDICATOR_HISTORY = int(os.environ.get('INDICATOR_HISTORY', 5000))
+INDICATOR_CACHE_SIZE = int(os.environ.get('INDICATOR_CACHE_SIZE', 2000))
+
+
+class SMA:
+    """Simple moving average; update() keeps a running sum over the window"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+
+    @staticmethod
+    def compute(values: np.ndarray, period: int) -> np.ndarray:
+        csum = np.concatenate(([0.0], np.cumsum(values, dtype=float)))
+        out = np.full(len(values), np.nan)
+        if period <= len(values):
+            out[period - 1:] = (csum[period:] - csum[:-period]) / period
+        return out
+
+    def seed(self, values: np.ndarray) -> np.ndarray:
+        self.window = deque(float(v) for v in values[-self.period:])
+        self.total = sum(self.window)
+        return self.compute(values, self.period)
+
+    def update(self, value: float) -> float:
+        self.window.append(value)
+        self.total += value
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        return self.total / self.period if len(self.window) == self.period else np.nan
+
+
+class EMA:
+    """Exponential moving average, seeded with the first value (pandas ewm adjust=False)"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.value = None
+
+    @staticmethod
+    def compute(values: np.ndarray, period: int) -> np.ndarray:
+        return pd.Series(values, dtype=float).ewm(span=period, adjust=False).mean().to_numpy()
+
+    def seed(self, values: np.ndarray) -> np.ndarray:
+        out = self.compute(values, self.period)
+        self.value = float(out[-1]) if len(out) else None
+        return out
+
+    def update(self, value: float) -> float:
+        self.value = value if self.value is None else self.value + self.alpha * (value - self.value)
+        return self.value
+
+
+class RSI:
+    """Wilder's RSI; update() carries the smoothed average gain and loss"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.prev = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.count = 0
+
+    @staticmethod
+    def _averages(values: np.ndarray, period: int) -> Tuple[np.ndarray, np.ndarray]:
+        delta = np.diff(np.asarray(values, dtype=float), prepend=np.nan)
+        gains = pd.Series(np.where(delta > 0, delta, 0.0))
+        losses = pd.Series(np.where(delta < 0, -delta, 0.0))
+        return (gains.ewm(alpha=1 / period, adjust=False).mean().to_numpy(),
+                losses.ewm(alpha=1 / period, adjust=False).mean().to_numpy())
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = 100 - 100 / (1 + np.asarray(avg_gain) / avg_loss)
+        return np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), out)
+
+    @classmethod
+    def compute(cls, values: np.ndarray, period: int) -> np.ndarray:
+        avg_gain, avg_loss = cls._averages(values, period)
+        out = cls._rsi(avg_gain, avg_loss)
+        out[:period - 1] = np.nan
+        return out
+
+    def seed(self, values: np.ndarray) -> np.ndarray:
+        avg_gain, avg_loss = self._averages(values, self.period)
+        if len(values):
+            self.prev, self.avg_gain, self.avg_loss = float(values[-1]), float(avg_gain[-1]), float(avg_loss[-1])
+        self.count = len(values)
+        out = self._rsi(avg_gain, avg_loss)
+        out[:self.period - 1] = np.nan
+        return out
+
+    def update(self, value: float) -> float:
+        delta = 0.0 if self.prev is None else value - self.prev
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if self.count == 0:
+            self.avg_gain, self.avg_loss = gain, loss
+        else:
+            alpha = 1 / self.period
+            self.avg_gain += alpha * (gain - self.avg_gain)
+            self.avg_loss += alpha * (loss - self.avg_loss)
+        self.prev = value
+        self.count += 1
+        if self.count < self.period:
+            return np.nan
+        return float(self._rsi(self.avg_gain, self.avg_loss))
+
+
+INDICATORS = {'sma': SMA, 'ema': EMA, 'rsi': RSI}
+
+
+class IndicatorSeries:
+    """One indicator over one market's candles, extended a candle at a time"""
+
+    def __init__(self, indicator):
+        self.indicator = indicator
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0)
+        self.size = 0
+
+    def _append(self, timestamp: int, value: float):
+        if self.size == len(self.values):
+            capacity = max(64, 2 * self.size)
+            self.timestamps = np.resize(self.timestamps, capacity)
+            self.values = np.resize(self.values, capacity)
+        self.timestamps[self.size] = timestamp
+        self.values[self.size] = value
+        self.size += 1
+
+    def _trim(self):
+        if self.size > 2 * INDICATOR_HISTORY:
+            drop = self.size - INDICATOR_HISTORY
+            self.timestamps[:INDICATOR_HISTORY] = self.timestamps[drop:self.size]
+            self.values[:INDICATOR_HISTORY] = self.values[drop:self.size]
+            self.size = INDICATOR_HISTORY
+
+    def _slice(self, timestamps: np.ndarray):
+        """Cached values for exactly these timestamps, or None"""
+        start = int(np.searchsorted(self.timestamps[:self.size], timestamps[0]))
+        end = start + len(timestamps)
+        if end > self.size or self.timestamps[start] != timestamps[0] or self.timestamps[end - 1] != timestamps[-1]:
+            return None
+        return self.values[start:end].copy()
+
+    def sync(self, timestamps: np.ndarray, source: np.ndarray) -> np.ndarray:
+        """Values aligned with `timestamps`; only candles newer than the cache are computed"""
+        if not len(timestamps):
+            return np.empty(0)
+        if self.size and timestamps[0] >= self.timestamps[0]:
+            last = self.timestamps[self.size - 1]
+            pos = int(np.searchsorted(timestamps, last))
+            if pos < len(timestamps) and timestamps[pos] == last:
+                for i in range(pos + 1, len(timestamps)):
+                    self._append(int(timestamps[i]), self.indicator.update(float(source[i])))
+                self._trim()
+            if timestamps[-1] <= self.timestamps[self.size - 1]:
+                values = self._slice(timestamps)
+                if values is not None:
+                    return values
+        # First use, a gap, or history before the cache: recompute from these candles
+        values = self.indicator.seed(np.asarray(source, dtype=float))
+        self.timestamps = np.array(timestamps, dtype=np.int64)
+        self.values = np.array(values, dtype=float)
+        self.size = len(values)
+        return self.values[:self.size].copy()
+
+
+class IndicatorService:
+    """Indicator series shared by every strategy on the same market.
+
+    Keyed by (exchange, symbol, timeframe, indicator, period, source): however many
+    strategies ask for RSI(14) on one market, it is computed once and then advanced in
+    O(1) per new candle.
+    """
+
+    def __init__(self, max_series: int = INDICATOR_CACHE_SIZE):
+        self.max_series = max_series
+        self._series: 'OrderedDict[tuple, IndicatorSeries]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, market: tuple, name: str, period: int, timestamps, source_values, source: str = 'close') -> np.ndarray:
+        """`name`(`period`) of `source_values`, aligned with `timestamps` (ms or datetime64)"""
+        timestamps = np.asarray(timestamps)
+        if np.issubdtype(timestamps.dtype, np.datetime64):
+            timestamps = timestamps.astype('datetime64[ms]').view(np.int64)
+        key = (*market, name, period, source)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = IndicatorSeries(INDICATORS[name](period))
+                while len(self._series) > self.max_series:
+                    self._series.popitem(last=False)
+            self._series.move_to_end(key)
+            return series.sync(timestamps, source_values)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+# Shared instance
+indicator_service = IndicatorService()
@@ -0,0 +1,67 @@
+from itertools import islice
+from typing import Iterable, Sequence
+import os
+
+import orjson
+from flask import Response
+
+from database import engine
+
+# Rows encoded per chunk, and fetched per round trip, when streaming an array
+JSON_STREAM_CHUNK = int(os.environ.get('JSON_STREAM_CHUNK', 500))
+
+
+def dumps(obj) -> bytes:
+    """orjson encoding; datetimes come out as .isoformat() would, enums as their value.
+
+    Keys are sorted, as jsonify sorts them, so objects keep the key order clients saw before.
+    """
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+
+
+def json_response(obj, status: int = 200) -> Response:
+    return Response(dumps(obj), status=status, mimetype='application/json')
+
+
+def rows_to_dicts(keys: Sequence[str], rows: Iterable) -> list:
+    """Column tuples to {key: value} objects, for selects labeled with the output names"""
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def iter_array(keys: Sequence[str], rows: Iterable, chunk: int = JSON_STREAM_CHUNK):
+    """A JSON array of row objects as byte chunks, encoding `chunk` rows at a time"""
+    rows = iter(rows)
+    yield b'['
+    separator = b''
+    while True:
+        batch = rows_to_dicts(keys, islice(rows, chunk))
+        if not batch:
+            break
+        yield separator + dumps(batch)[1:-1]
+        separator = b','
+    yield b']'
+
+
+def stream_query(query, status: int = 200) -> Response:
+    """Stream a Core select's rows as a JSON array of objects keyed by column label.
+
+    The query runs before the response starts, so database errors still raise in the
+    route; rows are then fetched and encoded a chunk at a time, never all in memory.
+    """
+    conn = engine.connect()
+    try:
+        result = conn.execution_options(yield_per=JSON_STREAM_CHUNK).execute(query)
+    except Exception:
+        conn.close()
+        raise
+
+    def generate():
+        try:
+            yield from iter_array(list(result.keys()), result)
+        finally:
+            conn.close()
+
+    response = Response(generate(), status=status, mimetype='application/json')
+    # Also covers a client that goes away before the body is read; closing twice is harmless
+    response.call_on_close(conn.close)
+    return response
@@ -44,13 +44,11 @@ class MarketDataProvider:
             raise Exception(f"API Error: {data}")
         
         # Convert to DataFrame
-        df = pd.DataFrame({
-            'timestamp': [pd.Timestamp(x[0], unit='ms') for x in data['prices']],
-            'close': [x[1] for x in data['prices']]
-        })
+        df = pd.DataFrame(data['prices'], columns=['timestamp', 'close'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
         
         if 'total_volumes' in data:
-            df['volume'] = [x[1] for x in data['total_volumes']]
+            df['volume'] = pd.DataFrame(data['total_volumes'], columns=['timestamp', 'volume'])['volume']
         
         # Create OHLCV by resampling to hourly candles
         df.set_index('timestamp', inplace=True)
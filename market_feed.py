@@ -0,0 +1,262 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+FEED_URLS = {
+    'gemini': 'wss://api.gemini.com/v2/marketdata',
+}
+MARKET_FEED_EXCHANGE = os.environ.get('MARKET_FEED_EXCHANGE', 'gemini')
+MARKET_FEED_SYMBOLS = os.environ.get('MARKET_FEED_SYMBOLS', '')
+MAX_BACKOFF = 30.0
+
+
+def market_id(symbol: str) -> str:
+    """Exchange-native id for a ccxt symbol, e.g. BTC/USD -> BTCUSD"""
+    return symbol.replace('/', '').upper()
+
+
+class OrderBook:
+    """Local L2 book for one symbol, kept current from price level changes"""
+
+    def __init__(self):
+        self.bids = {}
+        self.asks = {}
+        # Ascending price levels, so best bid is last and best ask first
+        self._bid_prices = []
+        self._ask_prices = []
+        self.ready = False
+        self.timestamp = None
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.bids, self.asks, self._bid_prices, self._ask_prices = {}, {}, [], []
+            self.ready = False
+
+    def update(self, side: str, price: float, size: float):
+        """Set the size at one level; size 0 removes it"""
+        levels, prices = (self.bids, self._bid_prices) if side in ('buy', 'bid') else (self.asks, self._ask_prices)
+        with self._lock:
+            if size == 0:
+                if levels.pop(price, None) is not None:
+                    del prices[bisect_left(prices, price)]
+            else:
+                if price not in levels:
+                    insort(prices, price)
+                levels[price] = size
+            self.timestamp = int(time.time() * 1000)
+
+    def best_bid(self) -> Optional[float]:
+        with self._lock:
+            return self._bid_prices[-1] if self._bid_prices else None
+
+    def best_ask(self) -> Optional[float]:
+        with self._lock:
+            return self._ask_prices[0] if self._ask_prices else None
+
+    def top(self, limit: int = 20) -> Dict[str, List[list]]:
+        with self._lock:
+            return {
+                'bids': [[p, self.bids[p]] for p in reversed(self._bid_prices[-limit:])],
+                'asks': [[p, self.asks[p]] for p in self._ask_prices[:limit]],
+            }
+
+
+class MarketFeed:
+    """Persistent WebSocket stream of L2 book and trade updates for a set of symbols.
+
+    Runs its own event loop in a daemon thread and reconnects with backoff; books are
+    cleared on disconnect and rebuilt from the snapshot sent after each subscribe.
+    Speaks the Gemini v2 market data protocol.
+    """
+
+    def __init__(self, exchange: str, symbols: List[str], url: str = None):
+        self.exchange = exchange.lower()
+        self.url = url or FEED_URLS.get(self.exchange)
+        if not self.url:
+            raise Exception(f"No market data stream for {exchange}")
+        self.symbols = {market_id(s): s for s in symbols}
+        self.books = {s: OrderBook() for s in symbols}
+        self.last_trades = {}
+        self.connected = threading.Event()
+        self._loop = None
+        self._task = None
+        self._thread = None
+
+    # ---------- ingest ----------
+
+    def subscribe_message(self) -> dict:
+        return {'type': 'subscribe', 'subscriptions': [{'name': 'l2', 'symbols': list(self.symbols)}]}
+
+    def handle(self, message: dict):
+        kind = message.get('type')
+        symbol = self.symbols.get(message.get('symbol'))
+        if symbol is None:
+            return
+        if kind == 'l2_updates':
+            book = self.books[symbol]
+            for side, price, size in message.get('changes', []):
+                book.update(side, float(price), float(size))
+            # The first update after subscribing is the full book
+            book.ready = True
+            for trade in message.get('trades', []):
+                self._trade(symbol, trade)
+        elif kind == 'trade':
+            self._trade(symbol, message)
+
+    def _trade(self, symbol: str, trade: dict):
+        self.last_trades[symbol] = {
+            'price': float(trade['price']),
+            'amount': float(trade['quantity']),
+            'side': trade.get('side'),
+            'timestamp': trade.get('timestamp'),
+        }
+
+    async def run(self):
+        backoff = 1.0
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=20) as ws:
+                    await ws.send(json.dumps(self.subscribe_message()))
+                    self.connected.set()
+                    backoff = 1.0
+                    async for raw in ws:
+                        self.handle(json.loads(raw))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"{self.exchange} market feed disconnected: {str(e)}")
+            finally:
+                self.connected.clear()
+                for book in self.books.values():
+                    book.clear()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def start(self) -> 'MarketFeed':
+        def target():
+            self._loop = asyncio.new_event_loop()
+            self._task = self._loop.create_task(self.run())
+            try:
+                self._loop.run_until_complete(self._task)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        self._thread = threading.Thread(target=target, name=f'market-feed-{self.exchange}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        # Reads fall back to REST right away, even while the socket is still closing
+        self.connected.clear()
+        if self._loop and self._task:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    # ---------- reads ----------
+
+    def orderbook(self, symbol: str, limit: int = 20) -> Optional[dict]:
+        """Top of the local book shaped like ExchangeAPI.get_orderbook, or None if not live"""
+        book = self.books.get(symbol)
+        if book is None or not book.ready or not self.connected.is_set():
+            return None
+        return {'symbol': symbol, **book.top(limit), 'timestamp': book.timestamp}
+
+    def ticker(self, symbol: str) -> Optional[dict]:
+        """Live last/bid/ask for symbol, or None if not live"""
+        book = self.books.get(symbol)
+        if book is None or not book.ready or not self.connected.is_set():
+            return None
+        trade = self.last_trades.get(symbol)
+        return {
+            'symbol': symbol,
+            'last_price': trade['price'] if trade else None,
+            'bid': book.best_bid(),
+            'ask': book.best_ask(),
+            'timestamp': book.timestamp,
+        }
+
+
+_feeds: Dict[str, MarketFeed] = {}
+
+
+def start_feed(exchange: str, symbols: List[str], url: str = None) -> MarketFeed:
+    exchange = exchange.lower()
+    if exchange in _feeds:
+        _feeds[exchange].stop()
+    _feeds[exchange] = MarketFeed(exchange, symbols, url).start()
+    return _feeds[exchange]
+
+
+def stop_feed(exchange: str):
+    feed = _feeds.pop(exchange.lower(), None)
+    if feed:
+        feed.stop()
+
+
+def get_feed(exchange: str) -> Optional[MarketFeed]:
+    return _feeds.get(exchange.lower())
+
+
+def start_configured_feed() -> Optional[MarketFeed]:
+    """Start the feed named by MARKET_FEED_EXCHANGE / MARKET_FEED_SYMBOLS, if any symbols are set"""
+    symbols = [s.strip() for s in MARKET_FEED_SYMBOLS.split(',') if s.strip()]
+    if not symbols:
+        return None
+    return start_feed(MARKET_FEED_EXCHANGE, symbols)
+
+
+class ReplayExchange:
+    """Local stand-in for the exchange WebSocket that replays recorded messages.
+
+    Each client gets the messages in order after it subscribes, then the connection is
+    held open. Use as `async with ReplayExchange(messages) as replay:` and point a
+    MarketFeed at replay.url.
+    """
+
+    def __init__(self, messages: List[dict], host: str = '127.0.0.1', port: int = 0, delay: float = 0.0):
+        self.messages = messages
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.subscriptions = []
+        self.server = None
+        self.url = None
+
+    async def _handler(self, ws):
+        self.subscriptions.append(json.loads(await ws.recv()))
+        for message in self.messages:
+            await ws.send(json.dumps(message))
+            if self.delay:
+                await asyncio.sleep(self.delay)
+        await ws.wait_closed()
+
+    async def __aenter__(self) -> 'ReplayExchange':
+        self.server = await websockets.serve(self._handler, self.host, self.port)
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = f"ws://{self.host}:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    feed = start_feed('gemini', ['BTC/USD'])
+    while True:
+        time.sleep(1)
+        print(feed.ticker('BTC/USD'))
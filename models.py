@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Enum, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -41,6 +41,8 @@ class User(Base):
     role = Column(Enum(UserRole), default=UserRole.FREE)
     paper_balance = Column(Float, default=10000.0)
     live_balance = Column(Float, default=0.0)
+    paper_realized_pnl = Column(Float, default=0.0)
+    live_realized_pnl = Column(Float, default=0.0)
     max_open_trades = Column(Integer, default=3)
     risk_per_trade = Column(Float, default=2.0)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -74,6 +76,7 @@ class APIKey(Base):
     encrypted_secret = Column(Text, nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user = relationship("User", back_populates="api_keys")
 
 
@@ -115,6 +118,7 @@ class Backtest(Base):
     end_date = Column(DateTime, nullable=False)
     initial_balance = Column(Float, nullable=False)
     status = Column(Enum(BacktestStatus), default=BacktestStatus.PENDING)
+    progress = Column(Float, default=0.0)
     final_balance = Column(Float)
     total_return_pct = Column(Float)
     total_trades = Column(Integer, default=0)
@@ -131,6 +135,9 @@ class Backtest(Base):
     results_data = Column(JSON)
     error_message = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    # Refreshed by the worker running it; a stale one means that worker died
+    heartbeat_at = Column(DateTime)
     completed_at = Column(DateTime)
     user = relationship("User", back_populates="backtests")
     strategy = relationship("Strategy", back_populates="backtests")
@@ -141,6 +148,8 @@ class Trade(Base):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     strategy_id = Column(Integer, ForeignKey('strategies.id'), nullable=False)
     exchange_order_id = Column(String(100))
+    # Venue the order was placed on; NULL on trades recorded before it was stored
+    exchange = Column(String(50))
     trading_pair = Column(String(20), nullable=False)
     side = Column(String(10), nullable=False)
     entry_price = Column(Float, nullable=False)
@@ -163,3 +172,8 @@ class Trade(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user = relationship("User", back_populates="trades")
     strategy = relationship("Strategy", back_populates="trades")
+    __table_args__ = (
+        # Open positions filter on the prefix; history also walks (exit_time, id) for keyset pages
+        Index('ix_trades_user_status_mode_exit', 'user_id', 'status', 'trading_mode', 'exit_time', 'id'),
+        Index('ix_trades_strategy_id', 'strategy_id'),
+    )
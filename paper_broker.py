@@ -0,0 +1,110 @@
+import os
+import time
+import uuid
+
+from database import DBSession
+from exchange_connector import ExchangeConnector
+from market_feed import get_feed
+from models import User
+
+PAPER_FEE_PCT = float(os.environ.get('PAPER_FEE_PCT', 0.1))
+PAPER_SLIPPAGE_PCT = float(os.environ.get('PAPER_SLIPPAGE_PCT', 0.05))
+BOOK_DEPTH = 50
+
+
+class PaperBroker:
+    """Simulated execution for paper trading, with the same calls as ExchangeConnector.
+
+    Orders fill against the market feed's local book when one is live, otherwise against
+    the shared ticker cache with a fixed slippage. Prices come from the public client, so
+    paper users need no API key and no order ever reaches the exchange. Limit orders are
+    immediate-or-cancel: they fill now at the limit or better, or are rejected.
+    """
+
+    def __init__(self, user_id, exchange_name='gemini', fee_pct=PAPER_FEE_PCT, slippage_pct=PAPER_SLIPPAGE_PCT):
+        self.user_id = user_id
+        self.exchange_name = exchange_name.lower()
+        self.fee_pct = fee_pct
+        self.slippage_pct = slippage_pct
+        self.market = ExchangeConnector(None, exchange_name)
+
+    def connect(self):
+        return None
+
+    def get_ticker(self, symbol, max_age=None):
+        return self.market.get_ticker(symbol, max_age)
+
+    def get_tickers(self, symbols, max_age=None):
+        return self.market.get_tickers(symbols, max_age)
+
+    def get_balance(self):
+        '''paper_balance in the shape of ccxt fetch_balance'''
+        with DBSession() as db:
+            balance = db.query(User.paper_balance).filter(User.id == self.user_id).scalar() or 0.0
+        return {
+            'USD': {'free': balance, 'used': 0.0, 'total': balance},
+            'free': {'USD': balance},
+            'used': {'USD': 0.0},
+            'total': {'USD': balance}
+        }
+
+    def create_market_buy(self, symbol, amount):
+        return self.fill(symbol, 'buy', amount)
+
+    def create_market_sell(self, symbol, amount):
+        return self.fill(symbol, 'sell', amount)
+
+    def create_limit_order(self, symbol, side, amount, price):
+        return self.fill(symbol, side, amount, limit=float(price))
+
+    def fill(self, symbol, side, amount, limit=None) -> dict:
+        '''Simulated fill shaped like a closed ccxt order'''
+        price = self._book_price(symbol, side, amount, limit)
+        if price is None:
+            price = self._ticker_price(symbol, side, limit)
+        cost = price * amount
+        return {
+            'id': f'paper-{uuid.uuid4().hex}',
+            'symbol': symbol,
+            'type': 'limit' if limit is not None else 'market',
+            'side': side,
+            'amount': amount,
+            'filled': amount,
+            'price': price,
+            'average': price,
+            'cost': cost,
+            'fee': {'cost': cost * self.fee_pct / 100, 'currency': symbol.split('/')[-1]},
+            'status': 'closed',
+            'timestamp': int(time.time() * 1000)
+        }
+
+    def _book_price(self, symbol, side, amount, limit):
+        '''Average price walking the live book, or None if there is no live book'''
+        feed = get_feed(self.exchange_name)
+        book = feed.orderbook(symbol, BOOK_DEPTH) if feed else None
+        levels = book and book['asks' if side == 'buy' else 'bids']
+        if not levels:
+            return None
+        remaining, cost = amount, 0.0
+        for level_price, size in levels:
+            if limit is not None and (level_price > limit if side == 'buy' else level_price < limit):
+                break
+            take = min(size, remaining)
+            cost += take * level_price
+            remaining -= take
+            if remaining <= 0:
+                return cost / amount
+        if limit is not None:
+            raise Exception(f'Paper limit {side} of {amount} {symbol} at {limit} cannot fill')
+        # Deeper than the local book: the rest fills past the last level
+        worst = levels[-1][0] * (1 + self.slippage_pct / 100 if side == 'buy' else 1 - self.slippage_pct / 100)
+        return (cost + remaining * worst) / amount
+
+    def _ticker_price(self, symbol, side, limit):
+        ticker = self.get_ticker(symbol)
+        touch = (ticker.get('ask') if side == 'buy' else ticker.get('bid')) or ticker['last']
+        if limit is not None:
+            if (touch > limit) if side == 'buy' else (touch < limit):
+                raise Exception(f'Paper limit {side} {symbol} at {limit} not marketable (touch {touch})')
+            return touch
+        return touch * (1 + self.slippage_pct / 100 if side == 'buy' else 1 - self.slippage_pct / 100)
@@ -0,0 +1,150 @@
+import inspect
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtesting import BacktestEngine, simple_ma_crossover_strategy
+from candle_store import CandleArrays, map_candles
+from strategy_runner import ma_periods
+
+# Candles attached from shared memory, set once per worker process by _init_worker
+_worker_df: Optional[pd.DataFrame] = None
+_worker_shm: List[shared_memory.SharedMemory] = []
+
+# Strategy form keys for the MA periods and the strategy arguments they stand for
+MA_ALIASES = {'fast_ma': 'fast_period', 'slow_ma': 'slow_period'}
+
+
+def expand_grid(param_grid: Dict[str, list], base_parameters: Optional[Dict] = None) -> List[Dict]:
+    """Every combination of param_grid laid over a Strategy.parameters-style dict"""
+    base = dict(base_parameters or {})
+    keys = list(param_grid)
+    return [{**base, **dict(zip(keys, values))} for values in itertools.product(*(param_grid[k] for k in keys))]
+
+
+def _share_frame(df: pd.DataFrame):
+    """Copy each column of df into its own shared memory block once"""
+    specs, blocks = [], []
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if values.dtype == object:
+            raise Exception(f"Column '{column}' cannot be shared, only numeric and datetime columns are supported")
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+        specs.append((column, block.name, values.dtype.str, len(values)))
+        blocks.append(block)
+    return specs, blocks
+
+
+def _attach_frame(specs) -> pd.DataFrame:
+    columns = {}
+    for column, name, dtype, length in specs:
+        block = shared_memory.SharedMemory(name=name)
+        _worker_shm.append(block)
+        columns[column] = np.ndarray((length,), dtype=np.dtype(dtype), buffer=block.buf)
+    return pd.DataFrame(columns, copy=False)
+
+
+def _init_worker(specs):
+    global _worker_df
+    _worker_df = _attach_frame(specs)
+
+
+def _init_mapped_worker(path: str, start: int, stop: int):
+    global _worker_df
+    _worker_df = map_candles(path, start, stop).to_frame()
+
+
+def _run_combination(job) -> Dict:
+    strategy, params, engine_kwargs = job
+    return run_combination(_worker_df, strategy, params, **engine_kwargs)
+
+
+def run_combination(df: pd.DataFrame, strategy: Callable, params: Dict, initial_capital: float = 10000,
+                    fee_pct: float = 0.001, risk_pct: float = 10) -> Dict:
+    """Backtest one parameter set and return its params merged with BacktestEngine.get_stats()"""
+    signals = strategy(df, **params)
+    engine = BacktestEngine(initial_capital=initial_capital, fee_pct=fee_pct, max_positions=1)
+    engine.run_vectorized(signals['timestamp'], signals['close'], signals['position'], risk_pct=risk_pct)
+    return {**params, **engine.get_stats()}
+
+
+def check_grid(strategy: Callable, param_grid: Dict[str, list]) -> Dict[str, list]:
+    """param_grid with fast_ma/slow_ma renamed; raises ValueError on keys the strategy does not take"""
+    grid = {MA_ALIASES.get(k, k): v for k, v in param_grid.items()}
+    signature = inspect.signature(strategy).parameters
+    if not any(p.kind == inspect.Parameter.VAR_KEYWORD for p in signature.values()):
+        unknown = [k for k in grid if k not in signature]
+        if unknown:
+            raise ValueError(f"{strategy.__name__} does not take {', '.join(unknown)}")
+    return grid
+
+
+def strategy_kwargs(strategy: Callable, params: Dict) -> Dict:
+    """Strategy.parameters as strategy arguments: MA periods read as live trading reads them,
+    other keys the strategy function does not accept (amount, fee_pct, ...) dropped"""
+    signature = inspect.signature(strategy).parameters
+    if any(k in params for k in (*MA_ALIASES, *MA_ALIASES.values())) and all(
+            k in signature for k in MA_ALIASES.values()):
+        fast, slow = ma_periods(params)
+        params = {**{k: v for k, v in params.items() if k not in MA_ALIASES}, 'fast_period': fast, 'slow_period': slow}
+    if any(p.kind == inspect.Parameter.VAR_KEYWORD for p in signature.values()):
+        return params
+    return {k: v for k, v in params.items() if k in signature}
+
+
+def run_parameter_sweep(df, param_grid: Dict[str, list], base_parameters: Optional[Dict] = None,
+                        strategy: Callable = simple_ma_crossover_strategy, rank_by: str = 'sharpe_ratio',
+                        workers: Optional[int] = None, initial_capital: float = 10000, fee_pct: float = 0.001,
+                        risk_pct: float = 10) -> pd.DataFrame:
+    """Grid-search strategy parameters over a process pool and return results ranked by rank_by.
+
+    df is a DataFrame, which is placed in shared memory once, or CandleArrays from
+    CandleStore.load_arrays, whose file every worker memory-maps itself (or which is shared
+    like a DataFrame when it spans segment files). Either way tasks only carry their
+    parameter dict. strategy must be a module-level function taking (df, **params).
+    """
+    if isinstance(df, CandleArrays) and df.path is None:
+        # Assembled from the store's segments, so there is no one file to map; share it instead
+        df = df.to_frame()
+    grid = check_grid(strategy, param_grid)
+    combos = [strategy_kwargs(strategy, params) for params in expand_grid(grid, base_parameters)]
+    engine_kwargs = {'initial_capital': initial_capital, 'fee_pct': fee_pct, 'risk_pct': risk_pct}
+    workers = min(workers or os.cpu_count() or 1, len(combos)) or 1
+
+    if workers == 1:
+        frame = df.to_frame() if isinstance(df, CandleArrays) else df
+        rows = [run_combination(frame, strategy, params, **engine_kwargs) for params in combos]
+    elif isinstance(df, CandleArrays):
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_mapped_worker,
+                                 initargs=(df.path, df.start, df.stop)) as pool:
+            jobs = ((strategy, params, engine_kwargs) for params in combos)
+            rows = list(pool.map(_run_combination, jobs, chunksize=max(1, len(combos) // (workers * 4))))
+    else:
+        specs, blocks = _share_frame(df)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(specs,)) as pool:
+                jobs = ((strategy, params, engine_kwargs) for params in combos)
+                rows = list(pool.map(_run_combination, jobs, chunksize=max(1, len(combos) // (workers * 4))))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    results = pd.DataFrame(rows)
+    if rank_by in results.columns:
+        results = results.sort_values(rank_by, ascending=False, na_position='last')
+    return results.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from datetime import datetime, timedelta
+    from candle_store import candle_store
+    candles = candle_store.load_arrays('binance', 'BTC/USDT', '1h', datetime.utcnow() - timedelta(days=365))
+    grid = {'fast_period': list(range(5, 30, 5)), 'slow_period': list(range(20, 100, 10))}
+    print(run_parameter_sweep(candles, grid).head(10).to_string())
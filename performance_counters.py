@@ -0,0 +1,83 @@
+from collections import defaultdict
+import logging
+
+from sqlalchemy import bindparam, case, func, select, update
+
+from database import init_db, DBSession
+from models import Strategy, Trade, TradeStatus, TradingMode, User
+
+logger = logging.getLogger(__name__)
+
+
+def apply_closed_trades(db, closed: list):
+    """Add closed trades to the strategy counters and user realized P&L, in the caller's transaction.
+
+    `closed` holds (user_id, strategy_id, mode, profit_loss) for each trade this
+    transaction closed. Deltas are summed per row, so a batch costs one executemany per
+    table however many trades it closed.
+    """
+    if not closed:
+        return
+    strategies = defaultdict(lambda: [0, 0, 0, 0.0])
+    users = defaultdict(lambda: [0.0, 0.0])
+    for user_id, strategy_id, mode, pnl in closed:
+        pnl = pnl or 0.0
+        counters = strategies[strategy_id]
+        counters[0] += 1
+        counters[1 if pnl > 0 else 2] += 1
+        counters[3] += pnl
+        users[user_id][0 if mode == TradingMode.PAPER else 1] += pnl
+
+    db.connection().execute(
+        update(Strategy).where(Strategy.id == bindparam('b_id')).values({
+            Strategy.total_trades: func.coalesce(Strategy.total_trades, 0) + bindparam('b_trades'),
+            Strategy.winning_trades: func.coalesce(Strategy.winning_trades, 0) + bindparam('b_wins'),
+            Strategy.losing_trades: func.coalesce(Strategy.losing_trades, 0) + bindparam('b_losses'),
+            Strategy.total_profit: func.coalesce(Strategy.total_profit, 0.0) + bindparam('b_profit'),
+            # Counters are not an edit; keep updated_at, which versions compiled conditions
+            Strategy.updated_at: Strategy.updated_at
+        }),
+        [{'b_id': sid, 'b_trades': c[0], 'b_wins': c[1], 'b_losses': c[2], 'b_profit': c[3]}
+         for sid, c in strategies.items()]
+    )
+    db.connection().execute(
+        update(User).where(User.id == bindparam('b_id')).values({
+            User.paper_realized_pnl: func.coalesce(User.paper_realized_pnl, 0.0) + bindparam('b_paper'),
+            User.live_realized_pnl: func.coalesce(User.live_realized_pnl, 0.0) + bindparam('b_live')
+        }),
+        [{'b_id': uid, 'b_paper': p[0], 'b_live': p[1]} for uid, p in users.items()]
+    )
+
+
+def reconcile():
+    """Rebuild every counter from the trades table, in one set-based statement per table"""
+    closed = Trade.status == TradeStatus.CLOSED
+    pnl = func.coalesce(Trade.profit_loss, 0.0)
+
+    def per_strategy(expr):
+        return select(expr).where(Trade.strategy_id == Strategy.id, closed).scalar_subquery()
+
+    def per_user(mode):
+        return select(func.coalesce(func.sum(pnl), 0.0)).where(
+            Trade.user_id == User.id, Trade.trading_mode == mode, closed).scalar_subquery()
+
+    with DBSession() as db:
+        strategies = db.execute(update(Strategy).values({
+            Strategy.total_trades: per_strategy(func.count(Trade.id)),
+            Strategy.winning_trades: per_strategy(func.coalesce(func.sum(case((pnl > 0, 1), else_=0)), 0)),
+            Strategy.losing_trades: per_strategy(func.coalesce(func.sum(case((pnl <= 0, 1), else_=0)), 0)),
+            Strategy.total_profit: per_strategy(func.coalesce(func.sum(pnl), 0.0)),
+            Strategy.updated_at: Strategy.updated_at
+        })).rowcount
+        users = db.execute(update(User).values({
+            User.paper_realized_pnl: per_user(TradingMode.PAPER),
+            User.live_realized_pnl: per_user(TradingMode.LIVE)
+        })).rowcount
+        db.commit()
+    logger.info(f"Reconciled counters for {strategies} strategies and {users} users")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    reconcile()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import logging
+import os
+
+from async_trading import AsyncExchangeConnector
+
+logger = logging.getLogger(__name__)
+
+STREAM_POLL_INTERVAL = float(os.environ.get('STREAM_POLL_INTERVAL', 1.0))
+STREAM_QUEUE_SIZE = 100
+
+
+def sse(event: str, data) -> str:
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class PriceHub:
+    """Fans one upstream ticker feed per (exchange, symbol) out to every subscribed client.
+
+    A feed starts with its first subscriber and stops with its last, so upstream load
+    follows the number of distinct symbols being watched, not the number of clients.
+    Subscribers are asyncio queues; a slow client loses its oldest ticks, never blocks a feed.
+    """
+
+    def __init__(self, poll_interval: float = STREAM_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.subscribers = {}
+        self.feeds = {}
+        self.latest = {}
+
+    def subscribe(self, exchange: str, symbol: str, queue: asyncio.Queue):
+        key = (exchange, symbol)
+        self.subscribers.setdefault(key, set()).add(queue)
+        if key not in self.feeds:
+            self.feeds[key] = asyncio.ensure_future(self._feed(exchange, symbol))
+        elif key in self.latest:
+            self._offer(queue, key, self.latest[key])
+
+    def unsubscribe(self, exchange: str, symbol: str, queue: asyncio.Queue):
+        key = (exchange, symbol)
+        queues = self.subscribers.get(key)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[key]
+            self.feeds.pop(key).cancel()
+            self.latest.pop(key, None)
+
+    async def _feed(self, exchange: str, symbol: str):
+        key = (exchange, symbol)
+        connector = AsyncExchangeConnector(None, exchange)
+        while True:
+            try:
+                ticker = await connector.get_ticker(symbol, max_age=self.poll_interval)
+                previous = self.latest.get(key)
+                if previous is None or (ticker.get('timestamp'), ticker.get('last')) != (previous.get('timestamp'), previous.get('last')):
+                    self.latest[key] = ticker
+                    for queue in list(self.subscribers.get(key, ())):
+                        self._offer(queue, key, ticker)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Price feed {exchange} {symbol} failed: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, key, ticker):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait((key[0], key[1], ticker))
+
+    def close(self):
+        for task in self.feeds.values():
+            task.cancel()
+        self.feeds.clear()
+        self.subscribers.clear()
+        self.latest.clear()
+
+
+# Singleton instance, used from the ASGI app's event loop
+price_hub = PriceHub()
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from typing import Optional
+import os
+import threading
+import time
+
+from flask import g, jsonify, request
+
+from auth import decode_access_token
+from database import DBSession
+from models import User, UserRole
+
+AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', 30))
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 10000))
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    """The User columns routes need, detached from any session"""
+    id: int
+    username: str
+    email: str
+    role: UserRole
+    paper_balance: float
+    live_balance: float
+    max_open_trades: int
+    risk_per_trade: float
+    paper_realized_pnl: float
+    live_realized_pnl: float
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries also expire after ttl seconds"""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, ttl: float = None):
+        expires = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class RequestAuth:
+    """Resolves a bearer token to a UserProfile, caching both the verified token and the profile"""
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_size: int = AUTH_CACHE_SIZE):
+        self.tokens = TTLCache(ttl, max_size)
+        self.profiles = TTLCache(ttl, max_size)
+
+    def user_id_for(self, token: str) -> Optional[int]:
+        user_id = self.tokens.get(token)
+        if user_id is not None:
+            return user_id
+        payload = decode_access_token(token)
+        if not payload or payload.get('sub') is None:
+            return None
+        user_id = int(payload['sub'])
+        # Never cache a token past its own expiry
+        self.tokens.put(token, user_id, ttl=payload.get('exp', 0) - time.time())
+        return user_id
+
+    def profile(self, user_id: int) -> Optional[UserProfile]:
+        profile = self.profiles.get(user_id)
+        if profile is not None:
+            return profile
+        with DBSession() as db:
+            row = db.query(
+                User.id, User.username, User.email, User.role, User.paper_balance,
+                User.live_balance, User.max_open_trades, User.risk_per_trade,
+                User.paper_realized_pnl, User.live_realized_pnl
+            ).filter(User.id == user_id).first()
+        if not row:
+            return None
+        profile = UserProfile(*row)
+        self.profiles.put(user_id, profile)
+        return profile
+
+    def current_user(self, auth_header: str) -> Optional[UserProfile]:
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return None
+        user_id = self.user_id_for(auth_header.replace('Bearer ', ''))
+        return self.profile(user_id) if user_id is not None else None
+
+    def invalidate(self, user_id: int):
+        """Forget a cached profile after the user row changes"""
+        self.profiles.pop(user_id)
+
+
+# Singleton instance
+request_auth = RequestAuth()
+
+
+def require_auth(view):
+    """Reject the request with 401 unless it carries a valid token; the profile is put on g.user"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            user = request_auth.current_user(request.headers.get('Authorization'))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        if not user:
+            return jsonify({'error': 'Unauthorized'}), 401
+        g.user = user
+        return view(*args, **kwargs)
+    return wrapper
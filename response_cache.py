@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Callable
+import os
+import threading
+import time
+
+from flask import Response, request
+
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 300))
+# Memory bound for all cached bodies in a worker; least recently used go first
+RESPONSE_CACHE_TOTAL_BYTES = int(os.environ.get('RESPONSE_CACHE_TOTAL_BYTES', 64 * 1024 * 1024))
+# Bigger bodies still get ETags and 304s, they just aren't kept in memory
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 256 * 1024))
+
+
+def make_etag(user_id: int, resource: str, version) -> str:
+    # The user is part of it so two users at the same version never share a validator
+    return blake2b(repr((user_id, resource, version)).encode(), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """Conditional GETs for per-user JSON resources.
+
+    A route passes a cheap version of what it would return (row count, max updated_at,
+    ...) and the ETag is a hash of it, so a client that already has that version gets a
+    304 without the body query running. Otherwise the encoded body is reused while its
+    ETag still matches and built only when it does not. The version is read on every
+    request, so writes from other worker processes are always seen; invalidate() lets a
+    write route drop the user's bodies in this process straight away.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_bytes: int = RESPONSE_CACHE_TOTAL_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size = 0
+        # (user_id, resource) -> (etag, body, expires), in LRU order
+        self._entries = OrderedDict()
+        # user_id -> its resources, for invalidate()
+        self._by_user = {}
+        self._lock = threading.Lock()
+
+    def respond(self, user_id: int, resource: str, version, build: Callable[[], Response]) -> Response:
+        """304, cached body or build(), each carrying the ETag for `version`"""
+        etag = make_etag(user_id, resource, version)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            body = self._get(user_id, resource, etag)
+            if body is not None:
+                response = Response(body, mimetype='application/json')
+            else:
+                response = build()
+                if response.status_code == 200:
+                    self._keep(user_id, resource, etag, response)
+        response.set_etag(etag)
+        # Browsers may keep it but must revalidate every time; the version check keeps it fresh
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Authorization')
+        return response
+
+    def _keep(self, user_id: int, resource: str, etag: str, response: Response):
+        if not response.is_streamed:
+            self._put(user_id, resource, etag, response.get_data())
+            return
+        chunks = response.response
+
+        def tee():
+            # Collect a streamed body as it goes out and keep it once it completes
+            parts, size = [], 0
+            try:
+                for chunk in chunks:
+                    if size <= RESPONSE_CACHE_MAX_BYTES:
+                        parts.append(chunk)
+                        size += len(chunk)
+                    yield chunk
+            finally:
+                if hasattr(chunks, 'close'):
+                    chunks.close()
+            if size <= RESPONSE_CACHE_MAX_BYTES:
+                self._put(user_id, resource, etag, b''.join(parts))
+
+        response.response = tee()
+
+    def _get(self, user_id: int, resource: str, etag: str):
+        key = (user_id, resource)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != etag or entry[2] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put(self, user_id: int, resource: str, etag: str, body: bytes):
+        if len(body) > RESPONSE_CACHE_MAX_BYTES:
+            return
+        key = (user_id, resource)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (etag, body, time.monotonic() + self.ttl)
+            self._by_user.setdefault(user_id, set()).add(resource)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        """Drop one entry; caller holds the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry[1])
+        resources = self._by_user.get(key[0])
+        if resources is not None:
+            resources.discard(key[1])
+            if not resources:
+                del self._by_user[key[0]]
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            for resource in list(self._by_user.get(user_id, ())):
+                self._remove((user_id, resource))
+
+
+# Shared instance
+response_cache = ResponseCache()
@@ -0,0 +1,168 @@
+from bisect import bisect_left, bisect_right, insort
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import time
+
+from sqlalchemy import func
+
+from database import init_db, DBSession
+from exchange_connector import ExchangeConnector
+from models import Trade, Strategy, TradeStatus, TradingMode
+from trading_engine import TradingEngine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXCHANGE = 'gemini'
+POLL_INTERVAL = float(os.environ.get('RISK_MONITOR_POLL_INTERVAL', 1.0))
+RESYNC_INTERVAL = float(os.environ.get('RISK_MONITOR_RESYNC_INTERVAL', 30.0))
+CLOSE_THREADS = int(os.environ.get('RISK_MONITOR_CLOSE_THREADS', 8))
+
+
+class TriggerIndex:
+    """Stop-loss and take-profit levels of one market's open long trades, kept sorted by price"""
+
+    def __init__(self):
+        self.stops = []
+        self.targets = []
+
+    def __len__(self):
+        return len(self.stops) + len(self.targets)
+
+    def add(self, trade_id: int, stop_loss: float = None, take_profit: float = None):
+        if stop_loss:
+            insort(self.stops, (stop_loss, trade_id))
+        if take_profit:
+            insort(self.targets, (take_profit, trade_id))
+
+    def remove(self, trade_id: int, stop_loss: float = None, take_profit: float = None):
+        for levels, price in ((self.stops, stop_loss), (self.targets, take_profit)):
+            if price:
+                i = bisect_left(levels, (price, trade_id))
+                if i < len(levels) and levels[i] == (price, trade_id):
+                    del levels[i]
+
+    def triggered(self, price: float) -> list:
+        """(trade_id, reason, trigger_price) for every level crossed at price, found by bisection"""
+        hits = [(trade_id, 'stop_loss_hit', level)
+                for level, trade_id in self.stops[bisect_left(self.stops, (price, float('-inf'))):]]
+        hits += [(trade_id, 'take_profit_hit', level)
+                 for level, trade_id in self.targets[:bisect_right(self.targets, (price, float('inf')))]]
+        return hits
+
+
+class RiskMonitor:
+    """Enforces Trade.stop_loss / take_profit for every open trade.
+
+    Open trades are indexed per (exchange, symbol), so each price update only touches the
+    trades whose levels it crosses instead of re-checking every trade.
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL, resync_interval: float = RESYNC_INTERVAL):
+        self.poll_interval = poll_interval
+        self.resync_interval = resync_interval
+        self.indexes = {}
+        self.trades = {}
+        self.last_trade_id = 0
+        self.last_resync = 0.0
+        # Trades with a close in flight, kept out of the index until it finishes
+        self.closing = set()
+        self.pool = ThreadPoolExecutor(max_workers=CLOSE_THREADS)
+
+    def _query(self, db):
+        return db.query(
+            Trade.id, Trade.user_id, Trade.trading_pair, Trade.stop_loss, Trade.take_profit, Trade.trading_mode,
+            # The order's own venue; older trades fall back to their strategy's
+            func.coalesce(Trade.exchange, Strategy.exchange).label('exchange')
+        ).outerjoin(Strategy, Strategy.id == Trade.strategy_id).filter(
+            Trade.status == TradeStatus.OPEN,
+            Trade.side == 'buy',
+            (Trade.stop_loss.isnot(None)) | (Trade.take_profit.isnot(None))
+        )
+
+    def add(self, row):
+        if row.id in self.closing:
+            return
+        market = ((row.exchange or DEFAULT_EXCHANGE).lower(), row.trading_pair)
+        self.trades[row.id] = (row.user_id, market, row.stop_loss, row.take_profit, row.trading_mode)
+        self.indexes.setdefault(market, TriggerIndex()).add(row.id, row.stop_loss, row.take_profit)
+        self.last_trade_id = max(self.last_trade_id, row.id)
+
+    def discard(self, trade_id: int):
+        entry = self.trades.pop(trade_id, None)
+        if entry:
+            _, market, stop_loss, take_profit, _ = entry
+            index = self.indexes[market]
+            index.remove(trade_id, stop_loss, take_profit)
+            if not len(index):
+                del self.indexes[market]
+
+    def resync(self):
+        """Rebuild from the database, dropping trades closed elsewhere and picking up edited levels"""
+        with DBSession() as db:
+            rows = self._query(db).all()
+        self.indexes, self.trades, self.last_trade_id = {}, {}, 0
+        for row in rows:
+            self.add(row)
+        self.last_resync = time.monotonic()
+        logger.info(f"Watching {len(self.trades)} trades across {len(self.indexes)} markets")
+
+    def load_new(self):
+        with DBSession() as db:
+            for row in self._query(db).filter(Trade.id > self.last_trade_id).all():
+                self.add(row)
+
+    def on_price(self, exchange: str, symbol: str, price: float) -> list:
+        """Close every trade on this market whose stop or target the price has crossed"""
+        index = self.indexes.get((exchange, symbol))
+        if not index or price is None:
+            return []
+        hits = index.triggered(price)
+        for trade_id, reason, level in hits:
+            user_id, _, _, _, mode = self.trades[trade_id]
+            # Dropped either way; a failed close comes back on the next resync
+            self.discard(trade_id)
+            self.closing.add(trade_id)
+            logger.info(f"Trade {trade_id} {symbol} {reason} at {price} (trigger {level})")
+            self.pool.submit(self._close, user_id, exchange, trade_id, reason, mode)
+        return hits
+
+    def _close(self, user_id: int, exchange: str, trade_id: int, reason: str, mode: TradingMode = TradingMode.LIVE):
+        try:
+            TradingEngine(user_id, exchange, mode).close_position(trade_id, reason=reason)
+        except Exception as e:
+            logger.error(f"Failed to close trade {trade_id} on {reason}: {str(e)}")
+        finally:
+            self.closing.discard(trade_id)
+
+    def poll_prices(self):
+        by_exchange = {}
+        for exchange, symbol in self.indexes:
+            by_exchange.setdefault(exchange, []).append(symbol)
+        for exchange, symbols in by_exchange.items():
+            try:
+                tickers = ExchangeConnector(None, exchange).get_tickers(symbols)
+            except Exception as e:
+                logger.warning(f"Failed to get {exchange} tickers: {str(e)}")
+                continue
+            for symbol, ticker in tickers.items():
+                self.on_price(exchange, symbol, ticker.get('last'))
+
+    def run_forever(self):
+        while True:
+            started = time.monotonic()
+            try:
+                if started - self.last_resync > self.resync_interval:
+                    self.resync()
+                else:
+                    self.load_new()
+                self.poll_prices()
+            except Exception as e:
+                logger.error(f"Risk monitor cycle failed: {str(e)}")
+            time.sleep(max(0.0, self.poll_interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    RiskMonitor().run_forever()
@@ -0,0 +1,130 @@
+from dataclasses import dataclass, field
+from hashlib import blake2b
+import gzip
+import logging
+import mimetypes
+import os
+import re
+
+import brotli
+from flask import Response, abort, request, send_file
+from werkzeug.utils import get_content_type
+
+logger = logging.getLogger(__name__)
+
+FRONTEND_BUILD_DIR = os.environ.get('FRONTEND_BUILD_DIR', 'frontend/build')
+# Files above this are served from disk rather than held in memory
+STATIC_MEMORY_MAX = int(os.environ.get('STATIC_MEMORY_MAX', 4 * 1024 * 1024))
+# Smaller files gain nothing from compression
+STATIC_COMPRESS_MIN = 1024
+# Content hash in the file name, as react-scripts emits (main.1a2b3c4d.js, 453.9f8e7d6c.chunk.css)
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.')
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'application/manifest+json',
+                'application/xml', 'image/svg+xml')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+@dataclass
+class Asset:
+    path: str
+    content_type: str
+    etag: str
+    cache_control: str
+    # None for files over STATIC_MEMORY_MAX
+    body: bytes = None
+    # Content-Encoding -> compressed body
+    variants: dict = field(default_factory=dict)
+
+
+def _precompressed(path: str, data: bytes, suffix: str, compress) -> bytes:
+    """The `path + suffix` variant, compressed now only if it is missing or older than the file"""
+    target = path + suffix
+    try:
+        if os.path.getmtime(target) >= os.path.getmtime(path):
+            with open(target, 'rb') as f:
+                return f.read()
+    except OSError:
+        pass
+    compressed = compress(data)
+    try:
+        # Written next to the file so other workers and restarts reuse it
+        tmp = f'{target}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp, target)
+    except OSError as e:
+        logger.warning(f"Could not save {target}: {str(e)}")
+    return compressed
+
+
+class StaticAssets:
+    """The React build indexed once into an in-memory manifest.
+
+    Each file's bytes, ETag and gzip/brotli variants are prepared at startup, so a request
+    is a dict lookup with no filesystem calls or compression. Hashed bundles get
+    immutable year-long caching since a new build gives them new names; everything else
+    (index.html, manifest.json, ...) is revalidated by ETag.
+    """
+
+    def __init__(self, root: str = FRONTEND_BUILD_DIR):
+        self.root = root
+        self.assets = {}
+        self.load()
+
+    def load(self):
+        assets = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(('.gz', '.br', '.tmp')):
+                    continue
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                assets[key] = self._index(key, path)
+        self.assets = assets
+        logger.info(f"Indexed {len(assets)} static assets from {self.root}")
+
+    @staticmethod
+    def _index(key: str, path: str) -> Asset:
+        with open(path, 'rb') as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        asset = Asset(
+            path=os.path.abspath(path),
+            content_type=get_content_type(mimetype, 'utf-8'),
+            etag=blake2b(data, digest_size=16).hexdigest(),
+            cache_control=IMMUTABLE if key.startswith('static/') and HASHED_NAME.search(key) else REVALIDATE
+        )
+        if len(data) > STATIC_MEMORY_MAX:
+            return asset
+        asset.body = data
+        if len(data) >= STATIC_COMPRESS_MIN and mimetype.startswith(COMPRESSIBLE):
+            for encoding, suffix, compress in (
+                ('br', '.br', lambda d: brotli.compress(d, quality=11)),
+                ('gzip', '.gz', lambda d: gzip.compress(d, 9, mtime=0))
+            ):
+                variant = _precompressed(path, data, suffix, compress)
+                if len(variant) < len(data):
+                    asset.variants[encoding] = variant
+        return asset
+
+    def response(self, path: str) -> Response:
+        """The asset at `path`, or index.html so client-side routes load the app"""
+        asset = self.assets.get(path) or self.assets.get('index.html')
+        if asset is None:
+            abort(404)
+
+        encoding = next((e for e in ('br', 'gzip') if e in asset.variants and request.accept_encodings[e]), None)
+        etag = f'{asset.etag}-{encoding}' if encoding else asset.etag
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        elif asset.body is None:
+            response = send_file(asset.path, mimetype=asset.content_type, etag=False, conditional=True)
+        else:
+            response = Response(asset.variants.get(encoding, asset.body), content_type=asset.content_type)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = asset.cache_control
+        response.vary.add('Accept-Encoding')
+        return response
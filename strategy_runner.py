@@ -0,0 +1,242 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import time
+
+import numpy as np
+from sqlalchemy import func
+
+from candle_store import candle_store
+from conditions import compiled_strategy
+from database import init_db, DBSession
+from models import Strategy, StrategyStatus, Trade, TradeStatus, TradingMode, User
+from trading_engine import TradingEngine
+
+logger = logging.getLogger(__name__)
+
+RESCAN_INTERVAL = float(os.environ.get('STRATEGY_RESCAN_INTERVAL', 10.0))
+CLOSE_DELAY = float(os.environ.get('STRATEGY_CLOSE_DELAY', 2.0))
+ORDER_THREADS = int(os.environ.get('STRATEGY_ORDER_THREADS', 8))
+DEFAULT_FAST, DEFAULT_SLOW = 10, 30
+
+
+def ma_periods(parameters: dict):
+    """(fast, slow) MA periods; the strategy form stores fast_ma/slow_ma, backtests use fast_period/slow_period"""
+    parameters = parameters or {}
+    fast = parameters.get('fast_period', parameters.get('fast_ma', DEFAULT_FAST))
+    slow = parameters.get('slow_period', parameters.get('slow_ma', DEFAULT_SLOW))
+    return int(fast), int(slow)
+
+
+def ma_crossover_signals(close: np.ndarray, fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """simple_ma_crossover_strategy's `position` on the last bar, for many (fast, slow) pairs at once.
+
+    One cumulative sum gives every rolling mean as a difference of two entries, so each
+    extra strategy costs a few array lookups instead of its own rolling pass.
+    2 is an entry, -2 an exit, anything else no action.
+    """
+    csum = np.concatenate(([0.0], np.cumsum(close)))
+    n = len(close)
+
+    def mean(periods, end):
+        # Mean of close[end - p:end] for each period p; NaN where history is too short
+        start = end - periods
+        valid = start >= 0
+        out = np.full(len(periods), np.nan)
+        out[valid] = (csum[end] - csum[start[valid]]) / periods[valid]
+        return out
+
+    def signal(end):
+        diff = mean(fast, end) - mean(slow, end)
+        return np.where(diff > 0, 1, np.where(diff < 0, -1, 0))
+
+    return signal(n) - signal(n - 1)
+
+
+class StrategyRunner:
+    """Runs every ACTIVE strategy on bar close.
+
+    Strategies are grouped by (exchange, pair, timeframe); each group's candles are read
+    once per closed bar and all of its strategies are evaluated against them, so the work
+    per bar follows the number of distinct markets, not strategies. Strategies with
+    entry_conditions use their compiled conditions; the rest are MA crossovers evaluated
+    together in one vectorized pass.
+    """
+
+    def __init__(self, rescan_interval: float = RESCAN_INTERVAL):
+        self.rescan_interval = rescan_interval
+        self.groups = {}
+        self.last_bar = {}
+        self.pool = ThreadPoolExecutor(max_workers=ORDER_THREADS)
+
+    def load_groups(self):
+        with DBSession() as db:
+            rows = db.query(
+                Strategy.id, Strategy.user_id, Strategy.exchange, Strategy.trading_pair, Strategy.timeframe,
+                Strategy.parameters, Strategy.entry_conditions, Strategy.exit_conditions, Strategy.updated_at,
+                Strategy.trading_mode, Strategy.stop_loss_pct, Strategy.take_profit_pct
+            ).filter(Strategy.status == StrategyStatus.ACTIVE).all()
+        groups = {}
+        for row in rows:
+            groups.setdefault((row.exchange.lower(), row.trading_pair, row.timeframe), []).append(row)
+        self.groups = groups
+        self.last_bar = {key: bar for key, bar in self.last_bar.items() if key in groups}
+
+    def step_ms(self, exchange: str, timeframe: str) -> int:
+        return candle_store._api(exchange).exchange.parse_timeframe(timeframe) * 1000
+
+    def last_closed_bar(self, exchange: str, timeframe: str) -> int:
+        step = self.step_ms(exchange, timeframe)
+        return (int((time.time() - CLOSE_DELAY) * 1000) // step - 1) * step
+
+    def run_group(self, key, strategies, bar: int) -> bool:
+        """Evaluate one market on its closed bar; False if the exchange has not published it yet"""
+        exchange, symbol, timeframe = key
+        usable, compiled, periods = [], [], []
+        for s in strategies:
+            try:
+                c = compiled_strategy(s.id, s.updated_at, s.entry_conditions, s.exit_conditions)
+                if c is None:
+                    periods.append(ma_periods(s.parameters))
+            except Exception as e:
+                # e.g. conditions saved before they were validated; skip just this strategy
+                logger.error(f"Skipping strategy {s.id}: {str(e)}")
+                continue
+            usable.append(s)
+            compiled.append(c)
+        strategies = usable
+        if not strategies:
+            return True
+        crossover = [i for i, c in enumerate(compiled) if c is None]
+        periods = np.array(periods, dtype=np.int64).reshape(-1, 2)
+        lookback = max([int(periods.max()) + 1 if crossover else 1] + [c.lookback for c in compiled if c])
+        candles = candle_store.load_arrays(exchange, symbol, timeframe,
+                                           start=bar - lookback * self.step_ms(exchange, timeframe), end=bar)
+        if not len(candles) or int(candles.timestamp[-1].astype(np.int64)) != bar:
+            return False
+        signals = np.zeros(len(strategies), dtype=np.int64)
+        if crossover:
+            signals[crossover] = ma_crossover_signals(candles.close, periods[:, 0], periods[:, 1])
+        for i, c in enumerate(compiled):
+            if c:
+                try:
+                    signals[i] = c.last_signal(candles, market=key)
+                except Exception as e:
+                    logger.error(f"Strategy {strategies[i].id} failed on {symbol}: {str(e)}")
+        price = float(candles.close[-1])
+        self.act(strategies, signals, price)
+        return True
+
+    def act(self, strategies, signals, price: float):
+        entering = [s for s, sig in zip(strategies, signals) if sig == 2]
+        exiting = [s for s, sig in zip(strategies, signals) if sig == -2]
+        if not entering and not exiting:
+            return
+
+        ids = [s.id for s in strategies]
+        with DBSession() as db:
+            open_trades = db.query(Trade.id, Trade.strategy_id, Trade.trading_mode, Trade.exchange).filter(
+                Trade.strategy_id.in_(ids), Trade.status == TradeStatus.OPEN).all()
+            user_ids = {s.user_id for s in entering}
+            users = {u.id: u for u in db.query(
+                User.id, User.paper_balance, User.max_open_trades, User.risk_per_trade
+            ).filter(User.id.in_(user_ids)).all()} if user_ids else {}
+            open_counts = dict(db.query(Trade.user_id, func.count(Trade.id)).filter(
+                Trade.user_id.in_(user_ids), Trade.status == TradeStatus.OPEN
+            ).group_by(Trade.user_id).all()) if user_ids else {}
+        open_by_strategy = {}
+        for trade in open_trades:
+            open_by_strategy.setdefault(trade.strategy_id, []).append(trade)
+
+        for s in exiting:
+            for trade in open_by_strategy.get(s.id, []):
+                self.pool.submit(self._close, s, trade)
+        for s in entering:
+            user = users.get(s.user_id)
+            if s.id in open_by_strategy or not user:
+                continue
+            if open_counts.get(s.user_id, 0) >= (user.max_open_trades or 0):
+                logger.info(f"Strategy {s.id} entry skipped: user {s.user_id} at max open trades")
+                continue
+            mode = s.trading_mode or TradingMode.PAPER
+            risk = (user.risk_per_trade or 0) / 100
+            amount = (s.parameters or {}).get('amount')
+            if not amount and mode == TradingMode.PAPER:
+                amount = (user.paper_balance or 0) * risk / price
+            # Live entries without an amount are sized from the exchange balance in _open
+            if amount is not None and float(amount) <= 0:
+                continue
+            open_counts[s.user_id] = open_counts.get(s.user_id, 0) + 1
+            self.pool.submit(self._open, s, mode, float(amount) if amount else None, risk, price)
+
+    def _open(self, strategy, mode, amount: float = None, risk: float = 0.0, price: float = None):
+        try:
+            engine = TradingEngine(strategy.user_id, strategy.exchange, mode)
+            if amount is None:
+                amount = self._live_amount(engine, strategy.trading_pair, risk, price)
+                if amount <= 0:
+                    logger.info(f"Strategy {strategy.id} entry skipped: no free balance to size it")
+                    return
+            engine.execute_buy(
+                symbol=strategy.trading_pair,
+                amount=amount,
+                strategy_id=strategy.id,
+                stop_loss_pct=strategy.stop_loss_pct,
+                take_profit_pct=strategy.take_profit_pct
+            )
+        except Exception as e:
+            logger.error(f"Strategy {strategy.id} entry failed: {str(e)}")
+
+    @staticmethod
+    def _live_amount(engine, symbol: str, risk: float, price: float) -> float:
+        """risk_per_trade of the free quote currency on the exchange, in base units"""
+        quote = symbol.split('/')[-1]
+        free = (engine.get_balance().get('free') or {}).get(quote) or 0.0
+        return float(free) * risk / price
+
+    def _close(self, strategy, trade):
+        try:
+            TradingEngine(strategy.user_id, trade.exchange or strategy.exchange, trade.trading_mode).close_position(
+                trade.id, reason='strategy_exit')
+        except Exception as e:
+            logger.error(f"Strategy {strategy.id} exit of trade {trade.id} failed: {str(e)}")
+
+    def tick(self) -> float:
+        """Run every group whose bar has closed; return seconds until the next close"""
+        now_ms = int(time.time() * 1000)
+        wait = self.rescan_interval
+        for key, strategies in self.groups.items():
+            exchange, _, timeframe = key
+            bar = self.last_closed_bar(exchange, timeframe)
+            if self.last_bar.get(key) != bar:
+                try:
+                    if self.run_group(key, strategies, bar):
+                        self.last_bar[key] = bar
+                    else:
+                        wait = min(wait, CLOSE_DELAY)
+                        continue
+                except Exception as e:
+                    logger.error(f"Strategy group {key} failed: {str(e)}")
+            step = self.step_ms(exchange, timeframe)
+            next_close = bar + 2 * step + CLOSE_DELAY * 1000
+            wait = min(wait, max(0.0, (next_close - now_ms) / 1000))
+        return wait
+
+    def run_forever(self):
+        last_scan = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_scan > self.rescan_interval:
+                    self.load_groups()
+                    last_scan = time.monotonic()
+                wait = self.tick()
+            except Exception as e:
+                logger.error(f"Strategy runner cycle failed: {str(e)}")
+                wait = self.rescan_interval
+            time.sleep(max(wait, 0.5))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    StrategyRunner().run_forever()
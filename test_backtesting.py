@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from backtesting import BacktestEngine, OrderSide, simple_ma_crossover_strategy
+
+
+def random_candles(rng, n):
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=n, freq='h'),
+        'open': close, 'high': close, 'low': close, 'close': close,
+        'volume': rng.uniform(1, 10, n)
+    })
+
+
+def run_rows(df, signals, max_positions, risk_pct):
+    """The row-by-row loop run_vectorized replaces, as in run_backtest_example"""
+    engine = BacktestEngine(initial_capital=10000, fee_pct=0.001, max_positions=max_positions)
+    for timestamp, price, signal in zip(df['timestamp'], df['close'], signals):
+        if signal == 2 and engine.can_open_position():
+            engine.open_position(timestamp, price, OrderSide.BUY, risk_pct=risk_pct)
+        elif signal == -2 and len(engine.positions) > 0:
+            engine.close_position(timestamp, price)
+        engine.update_equity(timestamp, price)
+    while engine.positions:
+        engine.close_position(df['timestamp'].iloc[-1], df['close'].iloc[-1])
+    return engine
+
+
+def assert_same(loop, vectorized):
+    assert np.isclose(vectorized.capital, loop.capital, rtol=1e-12)
+    assert list(vectorized.timestamps) == list(loop.timestamps)
+    np.testing.assert_allclose(vectorized.equity_curve, loop.equity_curve, rtol=1e-12)
+    assert len(vectorized.closed_trades) == len(loop.closed_trades)
+    for a, b in zip(vectorized.closed_trades, loop.closed_trades):
+        assert (a.entry_time, a.exit_time) == (b.entry_time, b.exit_time)
+        np.testing.assert_allclose([a.entry_price, a.exit_price, a.size, a.pnl, a.fees],
+                                   [b.entry_price, b.exit_price, b.size, b.pnl, b.fees], rtol=1e-12)
+
+
+def test_vectorized_matches_row_loop():
+    rng = np.random.default_rng(7)
+    for trial in range(40):
+        df = random_candles(rng, int(rng.integers(50, 400)))
+        if trial % 2:
+            signals = simple_ma_crossover_strategy(df, fast_period=int(rng.integers(2, 8)),
+                                                   slow_period=int(rng.integers(10, 30)))['position'].to_numpy()
+        else:
+            # Repeated entries and exits without a position, to exercise the skips
+            signals = rng.choice([-2, 0, 0, 0, 2], size=len(df))
+        max_positions = int(rng.integers(1, 4))
+        risk_pct = float(rng.uniform(5, 50))
+
+        loop = run_rows(df, signals, max_positions, risk_pct)
+        vectorized = BacktestEngine(initial_capital=10000, fee_pct=0.001, max_positions=max_positions)
+        vectorized.run_vectorized(df['timestamp'], df['close'], signals, risk_pct=risk_pct)
+        assert_same(loop, vectorized)
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+from exchange_api import ExchangeAPI
+from market_feed import ReplayExchange, start_feed, stop_feed
+
+SNAPSHOT = {
+    'type': 'l2_updates', 'symbol': 'BTCUSD',
+    'changes': [['buy', '100.0', '1.5'], ['buy', '99.5', '2'], ['sell', '101.0', '1'], ['sell', '102.0', '3']],
+    'trades': [{'type': 'trade', 'symbol': 'BTCUSD', 'price': '100.5', 'quantity': '0.1', 'side': 'buy', 'timestamp': 1}],
+}
+MESSAGES = [
+    SNAPSHOT,
+    {'type': 'trade', 'symbol': 'BTCUSD', 'price': '100.8', 'quantity': '0.2', 'side': 'sell', 'timestamp': 2},
+    # Not subscribed; must be ignored
+    {'type': 'l2_updates', 'symbol': 'ETHUSD', 'changes': [['buy', '5.0', '1']]},
+    # Best bid pulled, a new ask level inside the spread
+    {'type': 'l2_updates', 'symbol': 'BTCUSD', 'changes': [['buy', '100.0', '0'], ['sell', '100.9', '0.5']]},
+]
+
+
+def run_replay(messages):
+    """ReplayExchange on its own loop in a thread, like the real socket; returns (replay, stop)"""
+    ready = threading.Event()
+    state = {}
+
+    async def serve():
+        async with ReplayExchange(messages) as replay:
+            state['replay'], state['done'] = replay, asyncio.Event()
+            ready.set()
+            await state['done'].wait()
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+    thread.start()
+    assert ready.wait(5)
+
+    def stop():
+        loop.call_soon_threadsafe(state['done'].set)
+        thread.join(5)
+    return state['replay'], stop
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_feed_replay_builds_book_and_ticker():
+    replay, stop_replay = run_replay(MESSAGES)
+    feed = start_feed('gemini', ['BTC/USD'], url=replay.url)
+    try:
+        assert wait_for(lambda: feed.last_trades.get('BTC/USD', {}).get('price') == 100.8
+                        and feed.books['BTC/USD'].best_ask() == 100.9)
+        assert replay.subscriptions == [feed.subscribe_message()]
+        assert feed.connected.is_set()
+
+        api = ExchangeAPI('gemini')
+        book = api.get_orderbook('BTC/USD', limit=2)
+        assert book['symbol'] == 'BTC/USD'
+        assert book['bids'] == [[99.5, 2.0]]
+        assert book['asks'] == [[100.9, 0.5], [101.0, 1.0]]
+
+        # Live prices over cached 24h stats, so no REST call is made
+        api._stats['BTC/USD'] = (time.monotonic(), {'symbol': 'BTC/USD', 'last_price': 90.0, 'bid': 89.0,
+                                                    'ask': 91.0, 'high_24h': 110.0, 'timestamp': 0})
+        ticker = api.get_ticker('BTC/USD')
+        assert (ticker['last_price'], ticker['bid'], ticker['ask']) == (100.8, 99.5, 100.9)
+        assert ticker['high_24h'] == 110.0
+    finally:
+        stop_feed('gemini')
+        stop_replay()
+
+    # A stopped feed no longer serves its book
+    assert feed.orderbook('BTC/USD') is None
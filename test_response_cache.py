@@ -0,0 +1,78 @@
+from flask import Flask
+
+from json_response import json_response
+from response_cache import RESPONSE_CACHE_MAX_BYTES, ResponseCache
+
+app = Flask(__name__)
+
+
+def respond(cache, user_id, version, body, headers=None, resource='items'):
+    """cache.respond inside a request; returns (response, number of times the body was built)"""
+    built = []
+
+    def build():
+        built.append(True)
+        return json_response(body)
+
+    with app.test_request_context(headers=headers or {}):
+        response = cache.respond(user_id, resource, version, build)
+    return response, len(built)
+
+
+def test_matching_etag_gets_304_without_building():
+    cache = ResponseCache()
+    first, builds = respond(cache, 1, 5, {'items': [1, 2]})
+    assert (first.status_code, builds) == (200, 1)
+    etag = first.get_etag()[0]
+    assert 'Authorization' in first.vary
+
+    second, builds = respond(cache, 1, 5, {'items': [1, 2]}, {'If-None-Match': f'"{etag}"'})
+    assert (second.status_code, builds) == (304, 0)
+    assert second.get_etag()[0] == etag
+
+    # Another user at the same version has a different validator
+    other, _ = respond(cache, 2, 5, {'items': [3]}, {'If-None-Match': f'"{etag}"'})
+    assert other.status_code == 200
+    assert other.get_etag()[0] != etag
+
+
+def test_new_version_rebuilds_and_invalidates_old_etag():
+    cache = ResponseCache()
+    first, _ = respond(cache, 1, 1, {'items': [1]})
+    etag = first.get_etag()[0]
+
+    # Same version without a validator: the kept body is served
+    cached, builds = respond(cache, 1, 1, {'items': ['not built']})
+    assert builds == 0
+    assert cached.get_json() == {'items': [1]}
+
+    changed, builds = respond(cache, 1, 2, {'items': [1, 2]}, {'If-None-Match': f'"{etag}"'})
+    assert (changed.status_code, builds) == (200, 1)
+    assert changed.get_json() == {'items': [1, 2]}
+    assert changed.get_etag()[0] != etag
+
+    cache.invalidate(1)
+    _, builds = respond(cache, 1, 2, {'items': [1, 2]})
+    assert builds == 1
+
+
+def test_total_bytes_bound_evicts_least_recently_used():
+    body = {'blob': 'x' * 1000}
+    size = len(json_response(body).get_data())
+    cache = ResponseCache(max_bytes=size * 3)
+    for user_id in (1, 2, 3):
+        respond(cache, user_id, 1, body)
+    # Touch user 1 so user 2 is the least recently used
+    assert respond(cache, 1, 1, body)[1] == 0
+
+    respond(cache, 4, 1, body)
+    assert cache.size <= cache.max_bytes
+    assert respond(cache, 2, 1, body)[1] == 1
+    assert respond(cache, 1, 1, body)[1] == 0
+
+    # Bodies over the per-body limit are answered but never kept
+    big = {'blob': 'x' * RESPONSE_CACHE_MAX_BYTES}
+    before = cache.size
+    respond(cache, 5, 1, big)
+    assert cache.size == before
+    assert respond(cache, 5, 1, big)[1] == 1
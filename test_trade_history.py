@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+import uuid
+
+import pytest
+
+from app import app
+from auth import create_access_token
+from database import init_db, DBSession
+from models import User, Strategy, StrategyStatus, Trade, TradeStatus, TradingMode
+
+
+@pytest.fixture
+def closed_trades():
+    """A user with 11 closed paper trades, several sharing an exit_time; yields (user_id, ids newest first)"""
+    init_db()
+    name = f"history-{uuid.uuid4().hex[:8]}"
+    exit_base = datetime(2024, 1, 1, 12, 0, 0)
+    with DBSession() as db:
+        user = User(username=name, email=f"{name}@example.com", password_hash='x')
+        db.add(user)
+        db.commit()
+        strategy = Strategy(user_id=user.id, name=name, exchange='gemini', trading_pair='BTC/USD', timeframe='1h',
+                            parameters={}, status=StrategyStatus.DRAFT, trading_mode=TradingMode.PAPER)
+        db.add(strategy)
+        db.commit()
+        trades = [Trade(user_id=user.id, strategy_id=strategy.id, trading_pair='BTC/USD', side='buy',
+                        entry_price=10.0, entry_amount=1.0, entry_time=exit_base - timedelta(days=1),
+                        exit_price=11.0, exit_amount=1.0, exit_time=exit_base + timedelta(minutes=i // 3),
+                        status=TradeStatus.CLOSED, trading_mode=TradingMode.PAPER)
+                  for i in range(11)]
+        # One open and one live trade that the paper history must leave out
+        trades.append(Trade(user_id=user.id, strategy_id=strategy.id, trading_pair='BTC/USD', side='buy',
+                            entry_price=10.0, entry_amount=1.0, entry_time=exit_base,
+                            status=TradeStatus.OPEN, trading_mode=TradingMode.PAPER))
+        trades.append(Trade(user_id=user.id, strategy_id=strategy.id, trading_pair='BTC/USD', side='buy',
+                            entry_price=10.0, entry_amount=1.0, entry_time=exit_base, exit_time=exit_base,
+                            status=TradeStatus.CLOSED, trading_mode=TradingMode.LIVE))
+        db.add_all(trades)
+        db.commit()
+        user_id = user.id
+        expected = [t.id for t in sorted(trades[:11], key=lambda t: (t.exit_time, t.id), reverse=True)]
+    yield user_id, expected
+    with DBSession() as db:
+        db.delete(db.get(User, user_id))
+        db.commit()
+
+
+def test_history_cursor_walks_every_trade_once(closed_trades):
+    user_id, expected = closed_trades
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {create_access_token({'sub': str(user_id)})}"}
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        query = {'trading_mode': 'paper', 'limit': 3, **({'cursor': cursor} if cursor else {})}
+        response = client.get('/api/trading/history', query_string=query, headers=headers)
+        assert response.status_code == 200
+        body = response.get_json()
+        seen += [trade['trade_id'] for trade in body['trades']]
+        pages += 1
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+        assert pages < 10
+
+    assert seen == expected
+    assert pages == 4
+
+
+def test_history_rejects_malformed_cursor(closed_trades):
+    user_id, _ = closed_trades
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {create_access_token({'sub': str(user_id)})}"}
+    for cursor in ('not-a-cursor', 'bm90fGEtbnVtYmVy'):
+        response = client.get('/api/trading/history', query_string={'trading_mode': 'paper', 'cursor': cursor},
+                              headers=headers)
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Invalid cursor'}
@@ -0,0 +1,83 @@
+from datetime import datetime
+import logging
+import uuid
+
+import pytest
+
+from database import init_db, DBSession
+from models import User, Strategy, StrategyStatus, Trade, TradeStatus, TradingMode
+from trade_recorder import TradeRecorder
+
+
+@pytest.fixture
+def account():
+    """A user with 100.0 paper balance and one strategy, removed afterwards"""
+    init_db()
+    name = f"recorder-{uuid.uuid4().hex[:8]}"
+    with DBSession() as db:
+        user = User(username=name, email=f"{name}@example.com", password_hash='x', paper_balance=100.0)
+        db.add(user)
+        db.commit()
+        strategy = Strategy(user_id=user.id, name=name, exchange='gemini', trading_pair='BTC/USD', timeframe='1h',
+                            parameters={}, status=StrategyStatus.DRAFT, trading_mode=TradingMode.PAPER)
+        db.add(strategy)
+        db.commit()
+        ids = user.id, strategy.id
+    yield ids
+    with DBSession() as db:
+        db.delete(db.get(User, ids[0]))
+        db.commit()
+
+
+def trade_values(user_id, strategy_id, **overrides):
+    return {'user_id': user_id, 'strategy_id': strategy_id, 'exchange_order_id': None, 'exchange': 'gemini',
+            'trading_pair': 'BTC/USD', 'side': 'buy', 'entry_price': 10.0, 'entry_amount': 1.0,
+            'entry_time': datetime.utcnow(), 'trading_mode': TradingMode.PAPER, 'status': TradeStatus.OPEN,
+            'stop_loss': None, 'take_profit': None, **overrides}
+
+
+def paper_balance(user_id):
+    with DBSession() as db:
+        return db.query(User.paper_balance).filter(User.id == user_id).scalar()
+
+
+def test_paper_balance_update_refuses_overdraft(account):
+    user_id, strategy_id = account
+    recorder = TradeRecorder()
+
+    refused = recorder.open_trade(trade_values(user_id, strategy_id), balance_delta=-150.0)
+    with pytest.raises(Exception, match='Insufficient paper balance'):
+        refused.result(5)
+    assert paper_balance(user_id) == 100.0
+
+    trade_id = recorder.open_trade(trade_values(user_id, strategy_id), balance_delta=-60.0).result(5)
+    assert paper_balance(user_id) == 40.0
+    with DBSession() as db:
+        assert db.query(Trade.id).filter(Trade.user_id == user_id).all() == [(trade_id,)]
+
+
+def test_failed_batch_is_retried_op_by_op(account, caplog):
+    user_id, strategy_id = account
+    with DBSession() as db:
+        trade = Trade(**trade_values(user_id, strategy_id))
+        db.add(trade)
+        db.commit()
+        open_id = trade.id
+
+    # A long flush interval puts all three operations in one batch
+    recorder = TradeRecorder(flush_interval=0.5)
+    with caplog.at_level(logging.WARNING, logger='trade_recorder'):
+        good = recorder.open_trade(trade_values(user_id, strategy_id), balance_delta=-10.0)
+        bad = recorder.open_trade(trade_values(user_id, strategy_id, trading_pair=None))
+        close = recorder.close_trade(open_id, user_id, TradingMode.PAPER, exit_price=12.0, amount=1.0,
+                                     fee=0.0, balance_delta=12.0)
+        new_id = good.result(5)
+        close.result(5)
+        with pytest.raises(Exception):
+            bad.result(5)
+
+    assert 'Trade batch of 3 failed, retrying one at a time' in caplog.text
+    assert paper_balance(user_id) == 102.0
+    with DBSession() as db:
+        rows = dict(db.query(Trade.id, Trade.status).filter(Trade.user_id == user_id).all())
+    assert rows == {open_id: TradeStatus.CLOSED, new_id: TradeStatus.OPEN}
@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+TICKER_CACHE_TTL = float(os.environ.get('TICKER_CACHE_TTL', 2.0))
+TICKER_CACHE_PATH = os.environ.get('TICKER_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'prismtrade_tickers.db'))
+LEASE_TIMEOUT = 5.0
+# Per-key locks are striped so the table stays fixed-size however many symbols are seen
+LOCK_STRIPES = 64
+
+
+class TickerCache:
+    """Short-lived cache of public tickers keyed by exchange and symbol.
+
+    Two tiers: a dict inside each process and a SQLite file shared by every worker on the
+    host. Concurrent misses on one key make a single upstream call: threads of a process
+    wait on a striped key lock, other processes (and batch lookups) wait on a lease row
+    in the shared file.
+    """
+
+    def __init__(self, ttl: float = TICKER_CACHE_TTL, path: str = TICKER_CACHE_PATH,
+                 lease_timeout: float = LEASE_TIMEOUT):
+        self.ttl = ttl
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.owner = uuid.uuid4().hex
+        self._local = {}
+        self._key_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._conns = threading.local()
+
+    # ---------- shared tier ----------
+
+    def _db(self):
+        conn = getattr(self._conns, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS tickers (key TEXT PRIMARY KEY, fetched_at REAL, data TEXT)')
+            conn.execute('CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, expires_at REAL)')
+            self._conns.conn = conn
+        return conn
+
+    def _read_shared(self, key, max_age):
+        try:
+            row = self._db().execute('SELECT fetched_at, data FROM tickers WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Ticker cache read failed: {str(e)}")
+            return None
+        if row and time.time() - row[0] < max_age:
+            entry = (row[0], json.loads(row[1]))
+            self._local[key] = entry
+            return entry[1]
+        return None
+
+    def _acquire_lease(self, key) -> bool:
+        now = time.time()
+        try:
+            cursor = self._db().execute(
+                'INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+                'WHERE leases.expires_at < ?',
+                (key, self.owner, now + self.lease_timeout, now))
+            return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            logger.warning(f"Ticker cache lease failed: {str(e)}")
+            return True
+
+    def _release_lease(self, key):
+        try:
+            self._db().execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, self.owner))
+        except sqlite3.Error:
+            pass
+
+    # ---------- public API ----------
+
+    def put(self, exchange: str, symbol: str, ticker: dict):
+        key = f'{exchange}:{symbol}'
+        fetched_at = time.time()
+        self._local[key] = (fetched_at, ticker)
+        try:
+            self._db().execute('INSERT OR REPLACE INTO tickers (key, fetched_at, data) VALUES (?, ?, ?)',
+                               (key, fetched_at, json.dumps(ticker, default=str)))
+        except sqlite3.Error as e:
+            logger.warning(f"Ticker cache write failed: {str(e)}")
+
+    def peek(self, exchange: str, symbol: str, max_age: float = None):
+        """Cached ticker no older than max_age seconds, or None"""
+        key = f'{exchange}:{symbol}'
+        max_age = self.ttl if max_age is None else max_age
+        entry = self._local.get(key)
+        if entry and time.time() - entry[0] < max_age:
+            return entry[1]
+        return self._read_shared(key, max_age)
+
+    def get(self, exchange: str, symbol: str, fetch, max_age: float = None) -> dict:
+        """Cached ticker, calling fetch() at most once across workers when it is stale"""
+        key = f'{exchange}:{symbol}'
+        max_age = self.ttl if max_age is None else max_age
+        entry = self._local.get(key)
+        if entry and time.time() - entry[0] < max_age:
+            return entry[1]
+
+        with self._key_locks[hash(key) % LOCK_STRIPES]:
+            ticker = self.peek(exchange, symbol, max_age)
+            if ticker is not None:
+                return ticker
+            deadline = time.time() + self.lease_timeout
+            while not self._acquire_lease(key):
+                # Another worker is fetching this key; wait for its result
+                time.sleep(0.02)
+                ticker = self._read_shared(key, max_age)
+                if ticker is not None:
+                    return ticker
+                if time.time() > deadline:
+                    break
+            try:
+                ticker = fetch()
+                self.put(exchange, symbol, ticker)
+                return ticker
+            finally:
+                self._release_lease(key)
+
+    def _fetch_leased(self, exchange: str, symbols: list, fetch_many, result: dict):
+        """fetch_many for symbols whose leases we hold, releasing them after"""
+        if not symbols:
+            return
+        try:
+            for symbol, ticker in fetch_many(symbols).items():
+                self.put(exchange, symbol, ticker)
+                result[symbol] = ticker
+        finally:
+            for symbol in symbols:
+                self._release_lease(f'{exchange}:{symbol}')
+
+    def local(self, exchange: str, symbol: str, max_age: float = None):
+        """In-process tier only: never touches the shared file, so safe on an event loop"""
+        entry = self._local.get(f'{exchange}:{symbol}')
+        if entry and time.time() - entry[0] < (self.ttl if max_age is None else max_age):
+            return entry[1]
+        return None
+
+    def get_many(self, exchange: str, symbols, fetch_many, max_age: float = None) -> dict:
+        """Cached tickers for symbols; stale ones are fetched together with fetch_many(missing).
+
+        Misses are leased like get(): symbols another thread or worker is already
+        fetching are waited for instead of fetched again.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        result, missing = {}, []
+        for symbol in dict.fromkeys(symbols):
+            ticker = self.peek(exchange, symbol, max_age)
+            if ticker is not None:
+                result[symbol] = ticker
+            else:
+                missing.append(symbol)
+        if not missing:
+            return result
+
+        owned = [s for s in missing if self._acquire_lease(f'{exchange}:{s}')]
+        waiting = [s for s in missing if s not in owned]
+        self._fetch_leased(exchange, owned, fetch_many, result)
+
+        deadline = time.time() + self.lease_timeout
+        while waiting and time.time() < deadline:
+            taken = []
+            for symbol in list(waiting):
+                key = f'{exchange}:{symbol}'
+                ticker = self._read_shared(key, max_age)
+                if ticker is not None:
+                    result[symbol] = ticker
+                    waiting.remove(symbol)
+                elif self._acquire_lease(key):
+                    # The holder finished without a result for it; fetch it ourselves
+                    taken.append(symbol)
+                    waiting.remove(symbol)
+            self._fetch_leased(exchange, taken, fetch_many, result)
+            if waiting:
+                time.sleep(0.02)
+        # Anything still waiting has a stuck lease holder; fetch it anyway
+        if waiting:
+            for symbol, ticker in fetch_many(waiting).items():
+                self.put(exchange, symbol, ticker)
+                result[symbol] = ticker
+        return result
+
+
+# Singleton instance
+ticker_cache = TickerCache()
@@ -0,0 +1,191 @@
+from concurrent.futures import Future
+from datetime import datetime
+import logging
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import case, func, insert, update
+
+from database import DBSession
+from models import Trade, TradeStatus, TradingMode, User
+from performance_counters import apply_closed_trades
+
+logger = logging.getLogger(__name__)
+
+# Most operations written in one transaction
+TRADE_FLUSH_BATCH = int(os.environ.get('TRADE_FLUSH_BATCH', 500))
+# How long the writer waits for more operations before committing a batch; with 0 it
+# commits whatever queued up while the previous commit was running (group commit)
+TRADE_FLUSH_INTERVAL = float(os.environ.get('TRADE_FLUSH_INTERVAL', 0.0))
+
+
+class _Op:
+    __slots__ = ('kind', 'params', 'balance_delta', 'future')
+
+    def __init__(self, kind, params=None, balance_delta=None):
+        self.kind = kind
+        self.params = params
+        self.balance_delta = balance_delta
+        self.future = Future()
+
+
+def _pnl(exit_price, amount, fee=None):
+    """profit_loss / profit_loss_pct as SQL, so closes need no read of the trade row.
+
+    With a fee (paper closes) P&L is net of it and of the entry fee already on the row,
+    so it matches the change in paper_balance; live P&L stays gross of exchange fees.
+    """
+    profit = (exit_price - Trade.entry_price) * amount
+    if fee is not None:
+        # SET expressions see the row before the update, so Trade.fees is the entry fee
+        profit = profit - func.coalesce(Trade.fees, 0.0) - fee
+    return {
+        Trade.profit_loss: case((Trade.side == 'buy', profit), else_=Trade.profit_loss),
+        Trade.profit_loss_pct: case((Trade.side == 'buy', profit / (Trade.entry_price * amount) * 100),
+                                    else_=Trade.profit_loss_pct),
+    }
+
+
+class TradeRecorder:
+    """Writes trade opens and closes from one thread, many per transaction.
+
+    Callers get a Future that resolves once their operation is committed (to the new
+    trade id for opens), so nothing is acknowledged before it is durable. Opens in a
+    batch go in as one bulk INSERT ... RETURNING; each close is a conditional
+    UPDATE ... RETURNING whose P&L feeds the strategy and user counters in the same
+    transaction. Paper balance changes stay per operation so each is checked on its own.
+    Being the only trade writer in the process, it also keeps trade writes from
+    contending with each other for the SQLite write lock.
+    """
+
+    def __init__(self, max_batch: int = TRADE_FLUSH_BATCH, flush_interval: float = TRADE_FLUSH_INTERVAL):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def open_trade(self, values: dict, balance_delta: float = None) -> Future:
+        """Insert a trade row; balance_delta is applied to the user's paper_balance in the same transaction"""
+        return self._submit(_Op('open', values, balance_delta))
+
+    def close_trade(self, trade_id: int, user_id: int, mode: TradingMode, exit_price: float, amount: float,
+                    exit_reason: str = 'manual_close', fee: float = None, balance_delta: float = None) -> Future:
+        """Close an open trade. Paper closes (balance_delta set) fail if the trade is not open"""
+        params = {'trade_id': trade_id, 'user_id': user_id, 'mode': mode, 'exit_price': exit_price,
+                  'amount': amount, 'exit_reason': exit_reason, 'fee': fee, 'exit_time': datetime.utcnow()}
+        return self._submit(_Op('close', params, balance_delta))
+
+    def flush(self, timeout: float = None):
+        """Block until everything submitted so far is committed"""
+        self._submit(_Op('flush')).result(timeout)
+
+    def _submit(self, op: _Op) -> Future:
+        with self._lock:
+            # A forked child inherits the queue but not the writer thread
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='trade-recorder', daemon=True)
+                self._thread.start()
+            self._queue.put(op)
+        return op.future
+
+    def _run(self):
+        q = self._queue
+        while True:
+            batch = [q.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    batch.append(q.get(timeout=remaining) if remaining > 0 else q.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: list):
+        opens = [op for op in batch if op.kind == 'open']
+        closes = [op for op in batch if op.kind == 'close']
+        failed = {}
+        try:
+            with DBSession() as db:
+                inserted = []
+                for op in opens:
+                    if op.balance_delta is not None and not self._adjust_balance(db, op.params['user_id'], op.balance_delta):
+                        failed[op] = Exception("Insufficient paper balance")
+                    else:
+                        inserted.append(op)
+                ids = []
+                if inserted:
+                    ids = db.execute(insert(Trade).returning(Trade.id, sort_by_parameter_order=True),
+                                     [op.params for op in inserted]).scalars().all()
+
+                closed = []
+                for op in closes:
+                    p = op.params
+                    values = {
+                        Trade.exit_price: p['exit_price'],
+                        Trade.exit_amount: p['amount'],
+                        Trade.exit_time: p['exit_time'],
+                        Trade.status: TradeStatus.CLOSED,
+                        Trade.exit_reason: p['exit_reason'],
+                        **_pnl(p['exit_price'], p['amount'], p['fee'])
+                    }
+                    if p['fee'] is not None:
+                        values[Trade.fees] = func.coalesce(Trade.fees, 0.0) + p['fee']
+                    # Conditional on OPEN so concurrent closes cannot both credit the proceeds
+                    row = db.execute(
+                        update(Trade).where(
+                            Trade.id == p['trade_id'],
+                            Trade.user_id == p['user_id'],
+                            Trade.trading_mode == p['mode'],
+                            Trade.status == TradeStatus.OPEN
+                        ).values(values).returning(Trade.strategy_id, Trade.profit_loss),
+                        execution_options={'synchronize_session': False}
+                    ).first()
+                    if row is None:
+                        # A live sell with no matching open trade just isn't recorded, as before
+                        if op.balance_delta is not None:
+                            failed[op] = Exception("Trade not found or already closed")
+                        continue
+                    closed.append((p['user_id'], row.strategy_id, p['mode'], row.profit_loss))
+                    if op.balance_delta is not None:
+                        self._adjust_balance(db, p['user_id'], op.balance_delta)
+                apply_closed_trades(db, closed)
+
+                db.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                # Nothing was committed; redo each op in its own transaction so one bad op
+                # fails alone instead of taking the others (maybe filled orders) with it
+                logger.warning(f"Trade batch of {len(batch)} failed, retrying one at a time: {str(e)}")
+                for op in batch:
+                    self._write([op])
+                return
+            logger.error(f"Trade write failed: {str(e)}")
+            batch[0].future.set_exception(e)
+            return
+
+        for op, trade_id in zip(inserted, ids):
+            op.future.set_result(trade_id)
+        for op in batch:
+            if op in failed:
+                op.future.set_exception(failed[op])
+            elif op.kind != 'open':
+                op.future.set_result(None)
+
+    @staticmethod
+    def _adjust_balance(db, user_id: int, delta: float) -> bool:
+        """Add delta to paper_balance in the batch transaction, refusing to go below zero"""
+        query = db.query(User).filter(User.id == user_id)
+        if delta < 0:
+            query = query.filter(User.paper_balance >= -delta)
+        return bool(query.update({User.paper_balance: User.paper_balance + delta}, synchronize_session=False))
+
+
+# Shared instance
+trade_recorder = TradeRecorder()
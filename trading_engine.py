@@ -1,22 +1,58 @@
 from exchange_connector import ExchangeConnector
+from paper_broker import PaperBroker
 from models import Trade, Strategy, User, TradingMode, TradeStatus
 from database import DBSession
+from trade_recorder import trade_recorder
 from datetime import datetime
+from sqlalchemy import select
+import base64
+import math
 import logging
 
 logger = logging.getLogger(__name__)
 
+def encode_history_cursor(trade: dict) -> str:
+    """Opaque keyset cursor pointing just past a get_trade_history row"""
+    exit_time = trade['exit_time']
+    if isinstance(exit_time, datetime):
+        exit_time = exit_time.isoformat()
+    raw = f"{exit_time}|{trade['trade_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_history_cursor(cursor: str):
+    """(exit_time, trade_id) from encode_history_cursor; raises ValueError if malformed"""
+    try:
+        exit_time, trade_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(exit_time), int(trade_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
 class TradingEngine:
-    """Core trading engine using CCXT via ExchangeConnector"""
+    """Core trading engine using CCXT via ExchangeConnector, or PaperBroker in paper mode"""
     
-    def __init__(self, user_id: int, exchange: str = 'gemini'):
+    def __init__(self, user_id: int, exchange: str = 'gemini', mode: TradingMode = TradingMode.LIVE):
         self.user_id = user_id
         self.exchange = exchange
-        self.connector = ExchangeConnector(user_id, exchange)
+        self.mode = mode
+        if mode == TradingMode.PAPER:
+            self.connector = PaperBroker(user_id, exchange)
+        else:
+            self.connector = ExchangeConnector(user_id, exchange)
+    
+    def _place_order(self, side: str, symbol: str, amount: float, order_type: str = 'market', price: float = None):
+        if order_type == 'limit':
+            if self.mode != TradingMode.PAPER:
+                raise Exception("Limit orders are only supported in paper trading")
+            return self.connector.create_limit_order(symbol, side, amount, price)
+        if side == 'buy':
+            return self.connector.create_market_buy(symbol, amount)
+        return self.connector.create_market_sell(symbol, amount)
     
     def execute_buy(self, symbol: str, amount: float, strategy_id: int = None, 
-                    stop_loss_pct: float = None, take_profit_pct: float = None) -> dict:
-        """Execute market buy order"""
+                    stop_loss_pct: float = None, take_profit_pct: float = None,
+                    order_type: str = 'market', price: float = None) -> dict:
+        """Execute market (or paper limit) buy order"""
+        self._check_strategy(strategy_id)
         try:
             # Connect to exchange
             self.connector.connect()
@@ -25,50 +61,68 @@ class TradingEngine:
             ticker = self.connector.get_ticker(symbol)
             entry_price = ticker['last']
             
-            # Execute market buy
-            order = self.connector.create_market_buy(symbol, amount)
-            
-            # Calculate stop loss and take profit prices
-            stop_loss = entry_price * (1 - stop_loss_pct / 100) if stop_loss_pct else None
-            take_profit = entry_price * (1 + take_profit_pct / 100) if take_profit_pct else None
+            # Execute buy
+            order = self._place_order('buy', symbol, amount, order_type, price)
             
-            # Record trade in database
-            with DBSession() as db:
-                trade = Trade(
-                    user_id=self.user_id,
-                    strategy_id=strategy_id,
-                    exchange_order_id=order.get('id'),
-                    trading_pair=symbol,
-                    side='buy',
-                    entry_price=entry_price,
-                    entry_amount=amount,
-                    entry_time=datetime.utcnow(),
-                    trading_mode=TradingMode.LIVE,
-                    status=TradeStatus.OPEN,
-                    stop_loss=stop_loss,
-                    take_profit=take_profit
-                )
-                db.add(trade)
-                db.commit()
-                db.refresh(trade)
-                
-                return {
-                    'success': True,
-                    'trade_id': trade.id,
-                    'order': order,
-                    'entry_price': entry_price,
-                    'amount': amount,
-                    'stop_loss': stop_loss,
-                    'take_profit': take_profit
-                }
+            return self._record_buy(symbol, amount, order, entry_price, strategy_id,
+                                    stop_loss_pct, take_profit_pct)
         
         except Exception as e:
             logger.error(f"Buy order failed: {str(e)}")
             raise Exception(f"Failed to execute buy order: {str(e)}")
     
-    def execute_sell(self, symbol: str, amount: float, trade_id: int = None) -> dict:
-        """Execute market sell order and close position"""
+    def _record_buy(self, symbol, amount, order, entry_price, strategy_id=None,
+                    stop_loss_pct=None, take_profit_pct=None) -> dict:
+        """Store the trade for a filled buy order; paper buys also debit paper_balance"""
+        if self.mode == TradingMode.PAPER:
+            entry_price = order['average']
+        
+        # Calculate stop loss and take profit prices
+        stop_loss = entry_price * (1 - stop_loss_pct / 100) if stop_loss_pct else None
+        take_profit = entry_price * (1 + take_profit_pct / 100) if take_profit_pct else None
+        
+        values = {
+            'user_id': self.user_id,
+            'strategy_id': strategy_id,
+            'exchange_order_id': order.get('id'),
+            'exchange': self.exchange.lower(),
+            'trading_pair': symbol,
+            'side': 'buy',
+            'entry_price': entry_price,
+            'entry_amount': amount,
+            'entry_time': datetime.utcnow(),
+            'trading_mode': self.mode,
+            'status': TradeStatus.OPEN,
+            'stop_loss': stop_loss,
+            'take_profit': take_profit
+        }
+        balance_delta = None
+        if self.mode == TradingMode.PAPER:
+            values['fees'] = order['fee']['cost']
+            balance_delta = -(order['cost'] + values['fees'])
+        
+        # Batched with other writes; resolves once committed
+        trade_id = trade_recorder.open_trade(values, balance_delta).result()
+        
+        return {
+            'success': True,
+            'trade_id': trade_id,
+            'order': order,
+            'entry_price': entry_price,
+            'amount': amount,
+            'stop_loss': stop_loss,
+            'take_profit': take_profit
+        }
+    
+    def execute_sell(self, symbol: str, amount: float, trade_id: int = None,
+                     exit_reason: str = 'manual_close', order_type: str = 'market', price: float = None) -> dict:
+        """Execute market (or paper limit) sell order and close position"""
+        if trade_id:
+            self._check_close(trade_id, symbol, amount)
         try:
+            if self.mode == TradingMode.PAPER and not trade_id:
+                raise Exception("Paper sells must close an open paper trade")
+            
             # Connect to exchange
             self.connector.connect()
             
@@ -76,30 +130,14 @@ class TradingEngine:
             ticker = self.connector.get_ticker(symbol)
             exit_price = ticker['last']
             
-            # Execute market sell
-            order = self.connector.create_market_sell(symbol, amount)
+            # Execute sell
+            order = self._place_order('sell', symbol, amount, order_type, price)
+            if self.mode == TradingMode.PAPER:
+                exit_price = order['average']
             
             # Update trade in database if trade_id provided
             if trade_id:
-                with DBSession() as db:
-                    trade = db.query(Trade).filter(
-                        Trade.id == trade_id,
-                        Trade.user_id == self.user_id
-                    ).first()
-                    
-                    if trade:
-                        trade.exit_price = exit_price
-                        trade.exit_amount = amount
-                        trade.exit_time = datetime.utcnow()
-                        trade.status = TradeStatus.CLOSED
-                        
-                        # Calculate P&L
-                        if trade.side == 'buy':
-                            trade.profit_loss = (exit_price - trade.entry_price) * amount
-                            trade.profit_loss_pct = ((exit_price - trade.entry_price) / trade.entry_price) * 100
-                        
-                        trade.exit_reason = 'manual_close'
-                        db.commit()
+                self._record_sell(trade_id, exit_price, amount, exit_reason, order)
             
             return {
                 'success': True,
@@ -112,8 +150,17 @@ class TradingEngine:
             logger.error(f"Sell order failed: {str(e)}")
             raise Exception(f"Failed to execute sell order: {str(e)}")
     
+    def _record_sell(self, trade_id, exit_price, amount, exit_reason='manual_close', order=None):
+        """Close the stored trade for a filled sell order; paper sells also credit paper_balance"""
+        fee = balance_delta = None
+        if self.mode == TradingMode.PAPER:
+            fee = order['fee']['cost']
+            balance_delta = order['cost'] - fee
+        trade_recorder.close_trade(trade_id, self.user_id, self.mode, exit_price, amount,
+                                   exit_reason, fee, balance_delta).result()
+    
     def get_balance(self) -> dict:
-        """Get account balance"""
+        """Get account balance (paper_balance in paper mode)"""
         try:
             self.connector.connect()
             balance = self.connector.get_balance()
@@ -125,84 +172,113 @@ class TradingEngine:
     def get_open_positions(self) -> list:
         """Get all open positions for user"""
         try:
-            with DBSession() as db:
-                trades = db.query(Trade).filter(
-                    Trade.user_id == self.user_id,
-                    Trade.status == TradeStatus.OPEN,
-                    Trade.trading_mode == TradingMode.LIVE
-                ).all()
-                
-                positions = []
-                for trade in trades:
-                    # Get current price
-                    try:
-                        self.connector.connect()
-                        ticker = self.connector.get_ticker(trade.trading_pair)
-                        current_price = ticker['last']
-                        
-                        # Calculate unrealized P&L
-                        if trade.side == 'buy':
-                            unrealized_pnl = (current_price - trade.entry_price) * trade.entry_amount
-                            unrealized_pnl_pct = ((current_price - trade.entry_price) / trade.entry_price) * 100
-                        else:
-                            unrealized_pnl = (trade.entry_price - current_price) * trade.entry_amount
-                            unrealized_pnl_pct = ((trade.entry_price - current_price) / trade.entry_price) * 100
-                        
-                        positions.append({
-                            'trade_id': trade.id,
-                            'symbol': trade.trading_pair,
-                            'side': trade.side,
-                            'entry_price': trade.entry_price,
-                            'current_price': current_price,
-                            'amount': trade.entry_amount,
-                            'unrealized_pnl': unrealized_pnl,
-                            'unrealized_pnl_pct': unrealized_pnl_pct,
-                            'stop_loss': trade.stop_loss,
-                            'take_profit': trade.take_profit,
-                            'entry_time': trade.entry_time.isoformat()
-                        })
-                    except:
-                        # Skip if can't get current price
-                        continue
-                
-                return positions
+            trades = self._open_trades()
+            if not trades:
+                return []
+            
+            # One price lookup per distinct symbol
+            try:
+                tickers = self.connector.get_tickers(trade.trading_pair for trade in trades)
+            except Exception as e:
+                logger.warning(f"Failed to get tickers for positions: {str(e)}")
+                tickers = {}
+            return self._positions(trades, tickers)
         
         except Exception as e:
             logger.error(f"Failed to get positions: {str(e)}")
             raise Exception(f"Failed to get positions: {str(e)}")
     
-    def get_trade_history(self, limit: int = 50) -> list:
-        """Get closed trade history"""
+    def _open_trades(self) -> list:
+        with DBSession() as db:
+            return db.query(
+                Trade.id, Trade.trading_pair, Trade.side, Trade.entry_price, Trade.entry_amount,
+                Trade.stop_loss, Trade.take_profit, Trade.entry_time
+            ).filter(
+                Trade.user_id == self.user_id,
+                Trade.status == TradeStatus.OPEN,
+                Trade.trading_mode == self.mode
+            ).all()
+    
+    @staticmethod
+    def _positions(trades, tickers: dict) -> list:
+        """Position dicts with unrealized P&L for open trade rows, given tickers by symbol"""
+        prices = {symbol: ticker.get('last') for symbol, ticker in tickers.items()}
+        
+        positions = []
+        for trade in trades:
+            current_price = prices.get(trade.trading_pair)
+            # Skip if can't get current price
+            if current_price is None:
+                continue
+            
+            # Calculate unrealized P&L
+            direction = 1 if trade.side == 'buy' else -1
+            price_change = (current_price - trade.entry_price) * direction
+            
+            positions.append({
+                'trade_id': trade.id,
+                'symbol': trade.trading_pair,
+                'side': trade.side,
+                'entry_price': trade.entry_price,
+                'current_price': current_price,
+                'amount': trade.entry_amount,
+                'unrealized_pnl': price_change * trade.entry_amount,
+                'unrealized_pnl_pct': (price_change / trade.entry_price) * 100,
+                'stop_loss': trade.stop_loss,
+                'take_profit': trade.take_profit,
+                'entry_time': trade.entry_time.isoformat()
+            })
+        
+        return positions
+    
+    def trade_history_rows(self, limit: int = 50, cursor: str = None):
+        """(keys, rows) of closed trades as column tuples, newest first, continuing after cursor if given"""
         try:
             with DBSession() as db:
-                trades = db.query(Trade).filter(
+                query = select(
+                    Trade.id.label('trade_id'),
+                    Trade.trading_pair.label('symbol'),
+                    Trade.side,
+                    Trade.entry_price,
+                    Trade.exit_price,
+                    Trade.entry_amount.label('amount'),
+                    Trade.profit_loss,
+                    Trade.profit_loss_pct,
+                    Trade.entry_time,
+                    Trade.exit_time,
+                    Trade.exit_reason
+                ).where(
                     Trade.user_id == self.user_id,
                     Trade.status == TradeStatus.CLOSED,
-                    Trade.trading_mode == TradingMode.LIVE
-                ).order_by(Trade.exit_time.desc()).limit(limit).all()
-                
-                history = []
-                for trade in trades:
-                    history.append({
-                        'trade_id': trade.id,
-                        'symbol': trade.trading_pair,
-                        'side': trade.side,
-                        'entry_price': trade.entry_price,
-                        'exit_price': trade.exit_price,
-                        'amount': trade.entry_amount,
-                        'profit_loss': trade.profit_loss,
-                        'profit_loss_pct': trade.profit_loss_pct,
-                        'entry_time': trade.entry_time.isoformat(),
-                        'exit_time': trade.exit_time.isoformat() if trade.exit_time else None,
-                        'exit_reason': trade.exit_reason
-                    })
-                
-                return history
+                    Trade.trading_mode == self.mode
+                )
+                if cursor:
+                    # Keyset page: seek in the (exit_time, id) index instead of skipping rows
+                    exit_time, trade_id = decode_history_cursor(cursor)
+                    query = query.where(
+                        (Trade.exit_time < exit_time) |
+                        ((Trade.exit_time == exit_time) & (Trade.id < trade_id))
+                    )
+                result = db.execute(query.order_by(Trade.exit_time.desc(), Trade.id.desc()).limit(limit))
+                return list(result.keys()), result.all()
         
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Failed to get trade history: {str(e)}")
             raise Exception(f"Failed to get trade history: {str(e)}")
     
+    def get_trade_history(self, limit: int = 50, cursor: str = None) -> list:
+        """Get closed trade history as dicts, newest first, continuing after cursor if given"""
+        keys, rows = self.trade_history_rows(limit, cursor)
+        history = []
+        for row in rows:
+            trade = dict(zip(keys, row))
+            trade['entry_time'] = trade['entry_time'].isoformat()
+            trade['exit_time'] = trade['exit_time'].isoformat() if trade['exit_time'] else None
+            history.append(trade)
+        return history
+    
     def check_stop_loss_take_profit(self, trade_id: int) -> dict:
         """Check if stop loss or take profit has been hit"""
         try:
@@ -245,28 +321,64 @@ class TradingEngine:
             logger.error(f"Failed to check SL/TP: {str(e)}")
             return {'action': 'none', 'reason': 'error', 'error': str(e)}
     
-    def close_position(self, trade_id: int, reason: str = 'manual') -> dict:
+    def close_position(self, trade_id: int, reason: str = 'manual_close') -> dict:
         """Close an open position"""
         try:
-            with DBSession() as db:
-                trade = db.query(Trade).filter(
-                    Trade.id == trade_id,
-                    Trade.user_id == self.user_id,
-                    Trade.status == TradeStatus.OPEN
-                ).first()
-                
-                if not trade:
-                    raise Exception("Trade not found or already closed")
-                
-                # Execute sell order
-                result = self.execute_sell(
-                    symbol=trade.trading_pair,
-                    amount=trade.entry_amount,
-                    trade_id=trade_id
-                )
-                
-                return result
+            symbol, amount = self._open_trade(trade_id)
+            
+            # Execute sell order
+            result = self.execute_sell(
+                symbol=symbol,
+                amount=amount,
+                trade_id=trade_id,
+                exit_reason=reason
+            )
+            
+            return result
         
         except Exception as e:
             logger.error(f"Failed to close position: {str(e)}")
             raise Exception(f"Failed to close position: {str(e)}")
+    
+    def _check_strategy(self, strategy_id):
+        """Raise ValueError unless strategy_id is one of the user's strategies; every trade needs one"""
+        if not isinstance(strategy_id, int) or isinstance(strategy_id, bool):
+            raise ValueError("strategy_id is required")
+        with DBSession() as db:
+            found = db.query(Strategy.id).filter(
+                Strategy.id == strategy_id,
+                Strategy.user_id == self.user_id
+            ).first()
+        if not found:
+            raise ValueError("Strategy not found")
+    
+    def _check_close(self, trade_id: int, symbol: str, amount: float):
+        """Raise ValueError unless symbol and amount are exactly the open trade's.
+        
+        A close credits the sale proceeds and closes the whole trade, so any other amount
+        or pair would misstate both (and mint paper balance).
+        """
+        try:
+            pair, entry_amount = self._open_trade(trade_id)
+        except Exception as e:
+            raise ValueError(str(e))
+        if symbol != pair:
+            raise ValueError(f"Trade {trade_id} is for {pair}, not {symbol}")
+        if not math.isclose(amount, entry_amount, rel_tol=1e-9):
+            raise ValueError(f"Trade {trade_id} must be closed in full ({entry_amount})")
+    
+    def _open_trade(self, trade_id: int):
+        """(symbol, amount) of one of the user's open trades on this engine's exchange"""
+        with DBSession() as db:
+            trade = db.query(Trade.trading_pair, Trade.entry_amount, Trade.exchange).filter(
+                Trade.id == trade_id,
+                Trade.user_id == self.user_id,
+                Trade.status == TradeStatus.OPEN,
+                Trade.trading_mode == self.mode
+            ).first()
+        
+        if not trade:
+            raise Exception("Trade not found or already closed")
+        if trade.exchange and trade.exchange != self.exchange.lower():
+            raise Exception(f"Trade {trade_id} was placed on {trade.exchange}, not {self.exchange}")
+        return trade.trading_pair, trade.entry_amount